@@ -0,0 +1,23 @@
+# Gunicorn с uvicorn-воркерами: web_2025.asgi, async-представления
+# Запуск: gunicorn -c deploy/gunicorn/asgi.py web_2025.asgi:application
+# Нужны пакеты uvicorn и uvicorn-worker (requirements.txt)
+
+bind = "127.0.0.1:8000"
+
+# Один процесс на ядро: запросы внутри воркера обслуживает цикл событий,
+# а не потоки, поэтому медленные клиенты и ожидание БД не блокируют воркер.
+# Одновременных запросов к БД на воркер — не больше DB_POOL_MAX_SIZE,
+# остальные ждут соединение из пула (DB_POOL_TIMEOUT). Без пула каждый
+# одновременный запрос открывает свое соединение, и при сотнях клиентов
+# PostgreSQL отвечает "too many clients already" (max_connections)
+workers = 3
+worker_class = "uvicorn_worker.UvicornWorker"
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "/var/log/gunicorn/access.log"
+errorlog = "/var/log/gunicorn/error.log"
+
+loglevel = "info"
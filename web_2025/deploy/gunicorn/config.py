@@ -1,6 +1,8 @@
 bind = "127.0.0.1:8000"
 
 workers = 3
+# Каждый поток берет соединение из пула psycopg: DB_POOL_MAX_SIZE в
+# settings не меньше threads, workers × DB_POOL_MAX_SIZE < max_connections
 threads = 2
 
 timeout = 60
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест: сколько одновременных соединений выдерживает сервер.
+
+Каждое из N соединений в цикле отправляет GET и читает ответ целиком;
+при --slow-client ответ читается медленно, как у мобильного клиента.
+Сравнение sync и async на одной машине:
+
+    gunicorn -c deploy/gunicorn/config.py web_2025.wsgi:application
+    python deploy/scripts/loadtest.py http://127.0.0.1:8000/courses/ -c 10 50 200
+
+    gunicorn -c deploy/gunicorn/asgi.py web_2025.asgi:application
+    python deploy/scripts/loadtest.py http://127.0.0.1:8000/courses/ -c 10 50 200
+
+Только стандартная библиотека, чтобы запускать на сервере без установки пакетов.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+async def fetch(host, port, path, slow_client):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n'
+            f'User-Agent: fefu-loadtest\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        while True:
+            chunk = await reader.read(1024 if slow_client else 65536)
+            if not chunk:
+                break
+            if slow_client:
+                await asyncio.sleep(0.01)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def connection_loop(target, deadline, timeout, slow_client, counter, results):
+    host, port, path = target
+    while time.monotonic() < deadline:
+        # Уникальный параметр обходит кэш страниц: измеряется работа view
+        separator = '&' if '?' in path else '?'
+        url = f'{path}{separator}loadtest={next(counter)}'
+        started = time.monotonic()
+        try:
+            status = await asyncio.wait_for(fetch(host, port, url, slow_client), timeout)
+        except asyncio.TimeoutError:
+            results['errors']['таймаут клиента'] += 1
+            continue
+        except OSError as exc:
+            results['errors'][type(exc).__name__] += 1
+            continue
+        except (ValueError, IndexError):
+            results['errors']['некорректный ответ'] += 1
+            continue
+        if status == 200:
+            results['latencies'].append(time.monotonic() - started)
+        else:
+            results['errors'][f'HTTP {status}'] += 1
+
+
+async def run_level(target, concurrency, duration, timeout, slow_client):
+    results = {'latencies': [], 'errors': Counter()}
+    counter = itertools.count()
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*[
+        connection_loop(target, deadline, timeout, slow_client, counter, results)
+        for _ in range(concurrency)
+    ])
+    return results
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='Адрес страницы, например http://127.0.0.1:8000/courses/')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[10, 50, 200],
+                        help='Числа одновременных соединений')
+    parser.add_argument('-d', '--duration', type=float, default=15, help='Длительность каждого уровня, секунды')
+    parser.add_argument('-t', '--timeout', type=float, default=10, help='Таймаут одного запроса, секунды')
+    parser.add_argument('--slow-client', action='store_true', help='Читать ответ медленно')
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    target = (parts.hostname, parts.port or 80, path)
+
+    print(f'{"соединений":>10} {"запросов/с":>11} {"p50, мс":>9} {"p95, мс":>9} {"ошибок":>7}')
+    for concurrency in args.concurrency:
+        results = asyncio.run(run_level(target, concurrency, args.duration, args.timeout, args.slow_client))
+        latencies = results['latencies']
+        print(
+            f'{concurrency:>10} {len(latencies) / args.duration:>11.1f} '
+            f'{percentile(latencies, 0.5) * 1000:>9.0f} {percentile(latencies, 0.95) * 1000:>9.0f} '
+            f'{results["errors"].total():>7}'
+        )
+        # Причины ошибок: таймаут клиента (--timeout), сброс соединения, код ответа
+        if results['errors']:
+            print(' ' * 11 + ', '.join(f'{reason}: {count}' for reason, count in results['errors'].most_common()))
+
+
+if __name__ == '__main__':
+    main()
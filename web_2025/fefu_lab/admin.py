@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.db.models import F
+from .exports import export_enrollments
 from .models import Profile, Instructor, Course, Enrollment
+from .pagination import EstimatedCountPaginator
+from .search import course_search_query, search_people, uses_full_text
 
 
 class ProfileInline(admin.StackedInline):
@@ -30,12 +34,16 @@ class CustomUserAdmin(BaseUserAdmin):
         return []
 
     list_display = ('username', 'email', 'get_full_name', 'get_role', 'is_staff', 'is_active')
+    list_select_related = ('profile',)
     list_filter = ('is_staff', 'is_active', 'is_superuser')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('username', 'email', 'first_name', 'last_name')
     
     def get_full_name(self, obj):
         return f"{obj.last_name} {obj.first_name}" if obj.first_name or obj.last_name else obj.username
     get_full_name.short_description = 'ФИО'
+    get_full_name.admin_order_field = 'last_name'
     
     def get_role(self, obj):
         try:
@@ -53,21 +61,35 @@ admin.site.register(User, CustomUserAdmin)
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ['get_full_name', 'email', 'role', 'get_additional_info', 'is_active']
+    list_select_related = ['user']
     list_filter = ['is_active', 'role', 'faculty', 'department', 'admin_level', 'created_at']
-    search_fields = ['user__first_name', 'user__last_name', 'user__email', 'student_id']
+    # Список студентов растет вместе с записями: без COUNT(*) по всей таблице
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_fields = ['search_name']
+    search_help_text = 'ФИО, email или номер студенческого; опечатки допускаются'
     list_editable = ['is_active']
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по денормализованной строке с индексом триграмм вместо
+        # icontains по четырем столбцам через JOIN с auth_user
+        if not search_term:
+            return queryset, False
+        return search_people(search_term, queryset), False
+    
     def get_full_name(self, obj):
         # Показываем ФИО из модели User, если оно есть
         if obj.user.first_name or obj.user.last_name:
             return f"{obj.user.last_name} {obj.user.first_name}"
         return obj.user.username
     get_full_name.short_description = 'ФИО'
+    get_full_name.admin_order_field = 'user__last_name'
     
     def email(self, obj):
         return obj.user.email
     email.short_description = 'Email'
+    email.admin_order_field = 'user__email'
     
     # Динамически меняем поля в зависимости от роли
     def get_fieldsets(self, request, obj=None):
@@ -126,10 +148,17 @@ class ProfileAdmin(admin.ModelAdmin):
 @admin.register(Instructor)
 class InstructorAdmin(admin.ModelAdmin):
     list_display = ['get_full_name', 'email', 'get_specialization', 'is_active', 'created_at']
+    list_select_related = ['profile__user']
     list_filter = ['is_active']
-    search_fields = ['profile__user__first_name', 'profile__user__last_name', 'profile__user__email']
+    search_fields = ['profile__search_name']
+    search_help_text = 'ФИО или email; опечатки допускаются'
     list_editable = ['is_active']
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_people(search_term, queryset, field='profile__search_name'), False
+    
     # Улучшенный селект для выбора профиля преподавателя
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'profile':
@@ -153,36 +182,78 @@ class InstructorAdmin(admin.ModelAdmin):
     get_specialization.short_description = 'Специализация'
 
 
+class InstructorListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по преподавателю, загружающий ФИО одним запросом"""
+    def field_choices(self, field, request, model_admin):
+        instructors = Instructor.objects.select_related('profile__user')
+        return [(instructor.pk, str(instructor)) for instructor in instructors]
+
+
+class CourseListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по курсу, загружающий только названия"""
+    def field_choices(self, field, request, model_admin):
+        return list(Course.objects.order_by('title').values_list('pk', 'title'))
+
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ['title', 'get_instructor_name', 'level', 'duration', 'price', 'is_active', 'enrolled_students_count', 'available_slots']
-    list_filter = ['is_active', 'level', 'instructor']
+    list_filter = ['is_active', 'level', ('instructor', InstructorListFilter)]
+    list_select_related = ['instructor__profile__user']
     search_fields = ['title', 'description', 'instructor__profile__user__first_name', 'instructor__profile__user__last_name']
     list_editable = ['is_active', 'price']
     readonly_fields = ['created_at', 'updated_at', 'enrolled_students_count', 'available_slots']
+    search_help_text = 'Слова из названия или описания; "фраза", -исключить'
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по GIN-индексу search_vector вместо ILIKE '%...%' по столбцам;
+        # search_fields остаются для SQLite
+        if search_term and uses_full_text(self.model):
+            return queryset.filter(search_vector=course_search_query(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
     
     def get_instructor_name(self, obj):
         if obj.instructor:
             return f"{obj.instructor.profile.user.last_name} {obj.instructor.profile.user.first_name}"
         return "Не назначен"
     get_instructor_name.short_description = 'Преподаватель'
+    get_instructor_name.admin_order_field = 'instructor__profile__user__last_name'
     
+    # Счетчик хранится в курсе, поэтому столбцы не делают запросов на строку
+    # и сортируются в БД
     def enrolled_students_count(self, obj):
         return obj.enrolled_students_count
     enrolled_students_count.short_description = 'Записанных студентов'
+    enrolled_students_count.admin_order_field = 'enrolled_students_count'
     
     def available_slots(self, obj):
         return obj.available_slots
     available_slots.short_description = 'Свободных мест'
+    available_slots.admin_order_field = F('max_students') - F('enrolled_students_count')
 
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ['get_student_name', 'get_course_title', 'enrolled_at', 'status', 'grade']
-    list_filter = ['status', 'enrolled_at', 'course']
+    list_select_related = ['student__user', 'course']
+    list_filter = ['status', 'enrolled_at', ('course', CourseListFilter)]
+    # Миллионы записей: число строк без фильтров — оценка PostgreSQL,
+    # а не два COUNT(*) по всей таблице на каждую страницу
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ['student__user__first_name', 'student__user__last_name', 'course__title']
     list_editable = ['status', 'grade']
     readonly_fields = ['enrolled_at', 'completed_at']
+    actions = ['export_csv', 'export_xlsx']
+    
+    # С «выбрать все» выгружается весь отфильтрованный список, построчно
+    def export_csv(self, request, queryset):
+        return export_enrollments(request, queryset, 'csv')
+    export_csv.short_description = 'Выгрузить в CSV'
+    
+    def export_xlsx(self, request, queryset):
+        return export_enrollments(request, queryset, 'xlsx')
+    export_xlsx.short_description = 'Выгрузить в XLSX'
     
     # Улучшенный селект для выбора студентов
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -194,10 +265,12 @@ class EnrollmentAdmin(admin.ModelAdmin):
     def get_student_name(self, obj):
         return f"{obj.student.user.last_name} {obj.student.user.first_name}"
     get_student_name.short_description = 'Студент'
+    get_student_name.admin_order_field = 'student__user__last_name'
     
     def get_course_title(self, obj):
         return obj.course.title
     get_course_title.short_description = 'Курс'
+    get_course_title.admin_order_field = 'course__title'
     
     # Поля в форме
     fieldsets = [
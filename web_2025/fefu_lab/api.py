@@ -0,0 +1,449 @@
+import hashlib
+import json
+from functools import wraps
+from operator import attrgetter
+
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .middleware import serves_async
+from .models import Course, Enrollment, Instructor, Profile
+from .page_cache import page_tags_for, tag_versions
+from .pagination import encode_cursor, key_values, keyset_query
+
+
+# Меняется при несовместимых изменениях формата ответов (и ETag вместе с ним)
+API_VERSION = 1
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 1000
+# Строк за один запрос к курсору БД при потоковой выдаче списка
+API_CHUNK_SIZE = 200
+
+PAGE_KEYS = ['pk']
+
+
+class ApiField:
+    """
+    Поле ресурса API: функция получения значения из объекта и то, что для
+    нее нужно загрузить — поля для only(), связи для select_related() и
+    prefetch_related(). Запрос строится только из запрошенных полей.
+    """
+    def __init__(self, value, only=(), select=(), prefetch=(), staff_only=False):
+        self.value = value
+        self.only = only
+        self.select = select
+        self.prefetch = prefetch
+        self.staff_only = staff_only
+
+
+def column(path, staff_only=False):
+    """Поле модели как есть; path может идти через связи: 'profile__faculty'"""
+    attrs = path.split('__')
+
+    def value(obj):
+        for attr in attrs:
+            if obj is None:
+                return None
+            obj = getattr(obj, attr)
+        return obj
+    select = ['__'.join(attrs[:-1])] if len(attrs) > 1 else []
+    return ApiField(value, only=[path], select=select, staff_only=staff_only)
+
+
+def person_name(path):
+    """Имя пользователя по пути до User: 'profile__user'"""
+    get_user = attrgetter(path.replace('__', '.'))
+    return ApiField(
+        lambda obj: get_user(obj).get_full_name() or get_user(obj).username,
+        only=[f'{path}__first_name', f'{path}__last_name', f'{path}__username'],
+        select=[path],
+    )
+
+
+class Resource:
+    """Набор объектов API: базовый запрос, поля и теги кэша страниц для ETag"""
+    def __init__(self, queryset, fields, default_fields, tags, filter_queryset=None):
+        self.queryset = queryset
+        self.fields = fields
+        self.default_fields = default_fields
+        self.tags = tags
+        self.filter_queryset = filter_queryset
+
+    def allowed_fields(self, request):
+        return {
+            name: field for name, field in self.fields.items()
+            if request.user.is_staff or not field.staff_only
+        }
+
+    def requested_fields(self, request):
+        """Поля из ?fields=id,title; без параметра — поля по умолчанию"""
+        allowed = self.allowed_fields(request)
+        raw = request.GET.get('fields')
+        if not raw:
+            return {name: allowed[name] for name in self.default_fields if name in allowed}
+        names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}')
+        return {name: allowed[name] for name in names}
+
+    def plan(self, request, fields):
+        """Запрос, загружающий только нужное запрошенным полям"""
+        queryset = self.queryset(request)
+        if self.filter_queryset is not None:
+            queryset = self.filter_queryset(request, queryset)
+        only, select, prefetch = [queryset.model._meta.pk.name], [], []
+        for field in fields.values():
+            only.extend(field.only)
+            select.extend(field.select)
+            prefetch.extend(field.prefetch)
+        if select:
+            queryset = queryset.select_related(*dict.fromkeys(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*dict.fromkeys(only))
+
+    def serialize(self, obj, fields):
+        return {name: field.value(obj) for name, field in fields.items()}
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def api_view(resource):
+    """
+    Только GET/HEAD, ошибки в JSON и строгий ETag с ответом 304 до вызова
+    view. ETag строится из версий тегов кэша страниц (их увеличивает
+    purge_tags() при изменении данных), прав пользователя и адреса с
+    параметрами, поэтому проверка If-None-Match не делает запросов к БД.
+    GZipMiddleware при сжатии ослабляет ETag (W/), сравнение If-None-Match
+    от этого не меняется.
+    """
+    def etag_func(request, *args, **kwargs):
+        raw = '|'.join(str(part) for part in (
+            API_VERSION,
+            *tag_versions(page_tags_for(resource.tags, args, kwargs)),
+            request.user.is_staff,
+            request.get_full_path(),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            try:
+                response = view_func(request, *args, **kwargs)
+            except BadRequest as exc:
+                response = JsonResponse({'error': str(exc)}, status=400)
+            except Http404 as exc:
+                response = JsonResponse({'error': str(exc) or 'Не найдено'}, status=404)
+            # Клиент может хранить ответ, но перед использованием проверяет ETag
+            patch_cache_control(response, no_cache=True)
+            return response
+        return require_safe(condition(etag_func=etag_func)(_wrapped_view))
+    return decorator
+
+
+def page_url(request, **cursor):
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('before', None)
+    params.update(cursor)
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+class PageStream:
+    """
+    Части JSON страницы списка: объекты сериализуются по одному, лишняя
+    строка (limit + 1) показывает, что есть следующая страница.
+    """
+    def __init__(self, request, resource, fields, limit, has_next, has_previous):
+        self.request = request
+        self.resource = resource
+        self.fields = fields
+        self.limit = limit
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.count = 0
+        self.first = self.last = None
+
+    def start(self):
+        return '{"results": ['
+
+    def item(self, obj):
+        """JSON объекта или None, если страница уже заполнена"""
+        if self.count == self.limit:
+            self.has_next = True
+            return None
+        separator = ', ' if self.count else ''
+        self.count += 1
+        if self.first is None:
+            self.first = obj
+        self.last = obj
+        return separator + dumps(self.resource.serialize(obj, self.fields))
+
+    def finish(self):
+        next_url = previous_url = None
+        if self.last is not None and self.has_next:
+            next_url = page_url(self.request, after=encode_cursor(key_values(self.last, PAGE_KEYS)))
+        if self.first is not None and self.has_previous:
+            previous_url = page_url(self.request, before=encode_cursor(key_values(self.first, PAGE_KEYS)))
+        return f'], "next": {dumps(next_url)}, "previous": {dumps(previous_url)}}}'
+
+
+def stream_page(request, resource, fields, queryset, limit, after, before):
+    """
+    JSON страницы списка по частям: объекты читаются из БД порциями по
+    API_CHUNK_SIZE, поэтому память не зависит от limit. Страница назад
+    (?before=) читается в обратном порядке и собирается целиком.
+    """
+    if before:
+        items = list(queryset)
+        page = PageStream(request, resource, fields, limit, has_next=True, has_previous=len(items) > limit)
+        rows = reversed(items[:limit])
+    else:
+        page = PageStream(request, resource, fields, limit, has_next=False, has_previous=bool(after))
+        # prefetch_related с iterator() подгружает связи для каждой порции
+        rows = queryset.iterator(chunk_size=API_CHUNK_SIZE)
+
+    yield page.start()
+    for obj in rows:
+        chunk = page.item(obj)
+        if chunk is None:
+            break
+        yield chunk
+    yield page.finish()
+
+
+async def astream_page(request, resource, fields, queryset, limit, after, before):
+    """Асинхронный вариант stream_page для ответов под ASGI"""
+    if before:
+        items = [obj async for obj in queryset]
+        page = PageStream(request, resource, fields, limit, has_next=True, has_previous=len(items) > limit)
+        rows = reversed(items[:limit])
+    else:
+        page = PageStream(request, resource, fields, limit, has_next=False, has_previous=bool(after))
+        rows = None
+
+    yield page.start()
+    if rows is not None:
+        for obj in rows:
+            chunk = page.item(obj)
+            if chunk is None:
+                break
+            yield chunk
+    else:
+        async for obj in queryset.aiterator(chunk_size=API_CHUNK_SIZE):
+            chunk = page.item(obj)
+            if chunk is None:
+                break
+            yield chunk
+    yield page.finish()
+
+
+def list_view(resource):
+    """
+    Список объектов ресурса: ?fields= — набор полей, ?limit= — размер
+    страницы (до API_MAX_LIMIT), ?after= и ?before= — курсоры из ответа.
+    """
+    @api_view(resource)
+    def view(request):
+        fields = resource.requested_fields(request)
+        queryset, limit, after, before = keyset_query(
+            request, resource.plan(request, fields), PAGE_KEYS,
+            default_limit=API_DEFAULT_LIMIT, max_limit=API_MAX_LIMIT,
+        )
+        # Под ASGI Django собрал бы синхронный итератор в память целиком
+        stream = astream_page if serves_async(request) else stream_page
+        return StreamingHttpResponse(
+            stream(request, resource, fields, queryset, limit, after, before),
+            content_type='application/json',
+        )
+    return view
+
+
+def detail_view(resource, lookup):
+    """Один объект ресурса по полю lookup из URL"""
+    @api_view(resource)
+    def view(request, **kwargs):
+        fields = resource.requested_fields(request)
+        obj = resource.plan(request, fields).filter(**{lookup: kwargs[lookup]}).first()
+        if obj is None:
+            raise Http404
+        return JsonResponse(resource.serialize(obj, fields), json_dumps_params={'ensure_ascii': False})
+    return view
+
+
+def instructor_ref(course):
+    instructor = course.instructor
+    if instructor is None:
+        return None
+    user = instructor.profile.user
+    return {'id': instructor.pk, 'name': user.get_full_name() or user.username}
+
+
+COURSE_FIELDS = {
+    'id': ApiField(attrgetter('pk')),
+    'slug': column('slug'),
+    'title': column('title'),
+    'description': column('description'),
+    'duration': column('duration'),
+    'level': column('level'),
+    'price': column('price'),
+    'max_students': column('max_students'),
+    'enrolled_students_count': column('enrolled_students_count'),
+    'available_slots': ApiField(attrgetter('available_slots'), only=['max_students', 'enrolled_students_count']),
+    'instructor': ApiField(
+        instructor_ref,
+        only=[
+            'instructor__profile__user__first_name',
+            'instructor__profile__user__last_name',
+            'instructor__profile__user__username',
+        ],
+        select=['instructor__profile__user'],
+    ),
+    'url': ApiField(Course.get_absolute_url, only=['slug']),
+    'created_at': column('created_at'),
+    'updated_at': column('updated_at'),
+}
+
+INSTRUCTOR_FIELDS = {
+    'id': ApiField(attrgetter('pk')),
+    'name': person_name('profile__user'),
+    'specialization': column('profile__specialization'),
+    'degree': column('profile__degree'),
+    'academic_rank': column('profile__academic_rank'),
+    'department': column('profile__department'),
+    'bio': column('profile__bio'),
+    'courses': ApiField(
+        lambda instructor: [{'slug': course.slug, 'title': course.title} for course in instructor.api_courses],
+        prefetch=[Prefetch(
+            'courses',
+            queryset=Course.objects.filter(is_active=True).only('slug', 'title', 'instructor').order_by('title', 'pk'),
+            to_attr='api_courses',
+        )],
+    ),
+}
+
+# Публичный профиль: без email, телефона, даты рождения и номера студенческого
+STUDENT_FIELDS = {
+    'id': ApiField(attrgetter('pk')),
+    'name': person_name('user'),
+    'faculty': column('faculty'),
+    'year_of_study': column('year_of_study'),
+    'bio': column('bio'),
+    'url': ApiField(Profile.get_absolute_url),
+    'courses': ApiField(
+        lambda student: [
+            {'slug': enrollment.course.slug, 'title': enrollment.course.title}
+            for enrollment in student.api_enrollments
+        ],
+        prefetch=[Prefetch(
+            'enrollments',
+            queryset=Enrollment.objects.filter(status='ACTIVE', course__is_active=True)
+            .select_related('course').only('student', 'course__slug', 'course__title').order_by('course__title', 'pk'),
+            to_attr='api_enrollments',
+        )],
+    ),
+}
+
+ENROLLMENT_FIELDS = {
+    'id': ApiField(attrgetter('pk')),
+    'student': ApiField(
+        lambda enrollment: {
+            'id': enrollment.student_id,
+            'name': enrollment.student.user.get_full_name() or enrollment.student.user.username,
+        },
+        only=['student__user__first_name', 'student__user__last_name', 'student__user__username'],
+        select=['student__user'],
+    ),
+    'course': ApiField(
+        lambda enrollment: {'slug': enrollment.course.slug, 'title': enrollment.course.title},
+        only=['course__slug', 'course__title'],
+        select=['course'],
+    ),
+    'status': column('status'),
+    'enrolled_at': column('enrolled_at'),
+    # Оценки видят только сотрудники
+    'completed_at': column('completed_at', staff_only=True),
+    'grade': column('grade', staff_only=True),
+}
+
+
+def active_courses(request):
+    return Course.objects.filter(is_active=True)
+
+
+def active_instructors(request):
+    return Instructor.objects.filter(is_active=True, profile__is_active=True)
+
+
+def active_students(request):
+    return Profile.objects.filter(role='STUDENT', is_active=True)
+
+
+def visible_enrollments(request):
+    """Сотрудники видят все записи, остальные — активные, как на страницах курсов"""
+    if request.user.is_staff:
+        return Enrollment.objects.all()
+    return Enrollment.objects.filter(status='ACTIVE', course__is_active=True, student__is_active=True)
+
+
+def filter_enrollments(request, queryset):
+    """?course=<slug>, ?student=<id профиля>, ?status=ACTIVE"""
+    course = request.GET.get('course')
+    if course:
+        queryset = queryset.filter(course__slug=course)
+    student = request.GET.get('student')
+    if student:
+        if not student.isdigit():
+            raise BadRequest('Параметр student должен быть числом')
+        queryset = queryset.filter(student_id=student)
+    status = request.GET.get('status')
+    if status:
+        if status not in dict(Enrollment.STATUS_CHOICES):
+            raise BadRequest('Неизвестный статус записи')
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+# Теги — те же, что сбрасывают страницы с этими данными (см. page_cache)
+COURSES = Resource(
+    active_courses, COURSE_FIELDS,
+    default_fields=['id', 'slug', 'title', 'level', 'duration', 'price', 'available_slots', 'instructor', 'url'],
+    tags=['courses', 'instructors'],
+)
+COURSE = Resource(
+    active_courses, COURSE_FIELDS,
+    default_fields=list(COURSE_FIELDS),
+    tags=lambda slug: [f'course:{slug}', 'instructors'],
+)
+INSTRUCTORS = Resource(
+    active_instructors, INSTRUCTOR_FIELDS,
+    default_fields=['id', 'name', 'specialization', 'degree', 'department'],
+    tags=['instructors', 'courses'],
+)
+STUDENTS = Resource(
+    active_students, STUDENT_FIELDS,
+    default_fields=['id', 'name', 'faculty', 'year_of_study', 'url'],
+    tags=['students', 'courses'],
+)
+ENROLLMENTS = Resource(
+    visible_enrollments, ENROLLMENT_FIELDS,
+    default_fields=['id', 'student', 'course', 'status', 'enrolled_at'],
+    tags=['courses', 'students'],
+    filter_queryset=filter_enrollments,
+)
+
+course_list = list_view(COURSES)
+course_detail = detail_view(COURSE, 'slug')
+instructor_list = list_view(INSTRUCTORS)
+instructor_detail = detail_view(INSTRUCTORS, 'pk')
+student_list = list_view(STUDENTS)
+student_detail = detail_view(STUDENTS, 'pk')
+enrollment_list = list_view(ENROLLMENTS)
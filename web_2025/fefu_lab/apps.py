@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class FefuLabConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fefu_lab'
+
+    def ready(self):
+        # Подключаем сигналы сброса кэша статистики, страниц и пользователей
+        # и обновления поискового индекса курсов
+        from . import backends, stats, page_cache, search  # noqa: F401
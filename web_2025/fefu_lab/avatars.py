@@ -0,0 +1,166 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+# Сторона квадратной миниатюры в пикселях: 150 — размер карточки профиля,
+# 300 — та же карточка на экранах с двойной плотностью пикселей
+THUMB_SIZES = (150, 300)
+# (формат Pillow, расширение, параметры сохранения)
+THUMB_FORMATS = (
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+)
+
+THUMB_ROOT = 'thumbs'
+
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_DIMENSION = 4096
+
+_executor = None
+
+
+def validate_avatar(value):
+    """Ограничить размер файла и разрешение загружаемого аватара"""
+    # Уже сохраненный файл не проверяем: full_clean() при каждом сохранении
+    # профиля открывал бы его из хранилища и падал, если файла нет
+    if getattr(value, '_committed', True):
+        return
+    max_size = getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', MAX_UPLOAD_SIZE)
+    if value.size > max_size:
+        raise ValidationError(f'Размер файла не должен превышать {max_size // (1024 * 1024)} МБ.')
+    # Разрешение проверяем до декодирования, чтобы не распаковывать огромные изображения
+    if value.width > MAX_DIMENSION or value.height > MAX_DIMENSION:
+        raise ValidationError(f'Разрешение изображения не должно превышать {MAX_DIMENSION}x{MAX_DIMENSION}.')
+
+
+def thumb_name(name, size, extension):
+    """avatars/user_13/photo.png -> thumbs/avatars/user_13/photo_150.webp"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(THUMB_ROOT, directory, f'{stem}_{size}.{extension}')
+
+
+def thumb_variants(name):
+    """Все миниатюры аватара; JPEG основного размера сохраняется последним"""
+    variants = [
+        (size, image_format, extension, params)
+        for image_format, extension, params in THUMB_FORMATS
+        for size in reversed(THUMB_SIZES)
+    ]
+    return [(thumb_name(name, size, extension), size, image_format, params)
+            for size, image_format, extension, params in variants]
+
+
+def thumbnails_ready(name):
+    # Последний сохраненный файл означает, что готовы все миниатюры
+    return default_storage.exists(thumb_variants(name)[-1][0])
+
+
+def generate_avatar_thumbnails(name):
+    """Создать миниатюры WebP и JPEG всех размеров для файла аватара"""
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+    for path, size, image_format, params in thumb_variants(name):
+        thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        if image_format == 'JPEG' and thumb.mode == 'RGBA':
+            # JPEG не поддерживает прозрачность — подкладываем белый фон
+            background = Image.new('RGB', thumb.size, (255, 255, 255))
+            background.paste(thumb, mask=thumb.getchannel('A'))
+            thumb = background
+        buffer = BytesIO()
+        thumb.save(buffer, image_format, **params)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def _generate_safely(name):
+    try:
+        generate_avatar_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры аватара %s', name)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'AVATAR_THUMBNAIL_WORKERS', 2),
+            thread_name_prefix='avatar-thumbs',
+        )
+    return _executor
+
+
+def schedule_avatar_thumbnails(name):
+    """
+    Создать миниатюры вне обработки запроса: в пуле потоков после
+    коммита транзакции. При AVATAR_THUMBNAIL_ASYNC = False — сразу
+    после коммита в текущем потоке.
+    """
+    def run():
+        if getattr(settings, 'AVATAR_THUMBNAIL_ASYNC', True):
+            get_executor().submit(_generate_safely, name)
+        else:
+            _generate_safely(name)
+    transaction.on_commit(run)
+
+
+class AvatarThumbnail:
+    """
+    Миниатюра аватара для шаблонов: url — JPEG основного размера,
+    webp_srcset/srcset — варианты для экранов 1x и 2x. Пока миниатюры
+    не готовы, отдается исходный файл.
+    """
+    def __init__(self, avatar):
+        self.name = avatar.name
+        self.original_url = avatar.url
+        self.ready = thumbnails_ready(self.name)
+
+    def variant_url(self, size, extension):
+        return default_storage.url(thumb_name(self.name, size, extension))
+
+    def srcset_for(self, extension):
+        if not self.ready:
+            return ''
+        return ', '.join(
+            f'{self.variant_url(size, extension)} {size // THUMB_SIZES[0]}x' for size in THUMB_SIZES
+        )
+
+    @property
+    def url(self):
+        return self.variant_url(THUMB_SIZES[0], 'jpg') if self.ready else self.original_url
+
+    @property
+    def srcset(self):
+        return self.srcset_for('jpg')
+
+    @property
+    def webp_srcset(self):
+        return self.srcset_for('webp')
+
+    def __str__(self):
+        return self.url
+
+
+@receiver(post_save, sender='fefu_lab.Profile')
+def avatar_saved(sender, instance, **kwargs):
+    if instance.avatar and not thumbnails_ready(instance.avatar.name):
+        schedule_avatar_thumbnails(instance.avatar.name)
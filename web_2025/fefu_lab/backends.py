@@ -1,27 +1,99 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Profile, Instructor
+
+
+USER_CACHE_KEY = 'fefu_lab:user:{}'
 
 class EmailBackend(ModelBackend):
     """
-    Кастомный бэкенд для аутентификации по email
+    Кастомный бэкенд для аутентификации по email или имени пользователя.
+
+    Email сравнивается без учета регистра через индекс по LOWER(email)
+    (миграция 0004). Пароль хэшируется ровно один раз, в том числе для
+    несуществующего пользователя, чтобы время ответа не выдавало,
+    зарегистрирован ли такой логин.
     """
+    def login_candidates(self, login):
+        """Пользователи, подходящие под логин: не больше двух строк по индексам"""
+        return (
+            User.objects.alias(email_lower=Lower('email'))
+            .filter(Q(email_lower=login.lower()) | Q(username=login))
+            .order_by('pk')[:2]
+        )
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Ищем пользователя по email или username
-            user = User.objects.get(
-                Q(email=username) | Q(username=username)
-            )
-        except User.DoesNotExist:
+        if username is None or password is None:
             return None
-        
+
+        candidates = list(self.login_candidates(username))
+        # Точное совпадение имени пользователя важнее email другого пользователя
+        exact = [user for user in candidates if user.username == username]
+        user = exact[0] if exact else (candidates[0] if len(candidates) == 1 else None)
+
+        if user is None:
+            # Хэшируем впустую, чтобы неизвестный логин проверялся так же долго
+            User().set_password(password)
+            return None
+
         # Проверяем пароль
-        if user.check_password(password):
+        if user.check_password(password) and self.user_can_authenticate(user):
             return user
         return None
 
     def get_user(self, user_id):
+        """
+        Пользователь сессии одним запросом вместе с профилем и записью
+        преподавателя. При USER_CACHE_TIMEOUT > 0 результат кэшируется
+        между запросами и сбрасывается при сохранении User, Profile или Instructor.
+        """
+        timeout = getattr(settings, 'USER_CACHE_TIMEOUT', 0)
+        key = USER_CACHE_KEY.format(user_id)
+        if timeout:
+            user = cache.get(key)
+            if user is not None:
+                return user
         try:
-            return User.objects.get(pk=user_id)
+            user = User.objects.select_related('profile__instructor_info').get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+        if timeout:
+            cache.set(key, user, timeout)
+        return user
+
+    async def aget_user(self, user_id):
+        # ModelBackend.aget_user загрузил бы пользователя без профиля
+        return await sync_to_async(self.get_user)(user_id)
+
+
+def invalidate_cached_user(user_id):
+    transaction.on_commit(lambda: cache.delete(USER_CACHE_KEY.format(user_id)))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def user_profile_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+def user_instructor_changed(sender, instance, **kwargs):
+    user_id = Profile.objects.filter(pk=instance.profile_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_cached_user(user_id)
@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .page_cache import tag_versions
+
+
+CARD_TAGS = ('students', 'instructors')
+
+
+def card_versions(request):
+    """
+    Версии тегов страниц для ключей кэша карточек. Имена студентов и
+    преподавателей хранятся в User и не меняют updated_at карточки, зато
+    их изменение увеличивает версию тега. Версии читаются из кэша одним
+    запросом и только на страницах, где выводятся карточки.
+    """
+    return {'card_versions': SimpleLazyObject(lambda: dict(zip(CARD_TAGS, tag_versions(CARD_TAGS))))}
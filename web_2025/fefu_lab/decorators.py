@@ -2,6 +2,8 @@ from django.contrib.auth.decorators import user_passes_test
 from django.http import HttpResponseForbidden
 from functools import wraps
 
+from .middleware import get_profile
+
 def student_required(function=None):
     """
     Декоратор для проверки, что пользователь - студент
@@ -13,10 +15,10 @@ def student_required(function=None):
                 from django.contrib.auth.views import redirect_to_login
                 return redirect_to_login(request.get_full_path())
             
-            # Проверяем роль в профиле
-            if hasattr(request.user, 'profile'):
-                if request.user.profile.role == 'STUDENT':
-                    return view_func(request, *args, **kwargs)
+            # Проверяем роль в профиле, загруженном вместе с пользователем
+            profile = get_profile(request)
+            if profile is not None and profile.role == 'STUDENT':
+                return view_func(request, *args, **kwargs)
             
             return HttpResponseForbidden("Доступ запрещен. Требуется роль студента.")
         return _wrapped_view
@@ -37,9 +39,9 @@ def teacher_required(function=None):
                 from django.contrib.auth.views import redirect_to_login
                 return redirect_to_login(request.get_full_path())
             
-            if hasattr(request.user, 'profile'):
-                if request.user.profile.role == 'TEACHER':
-                    return view_func(request, *args, **kwargs)
+            profile = get_profile(request)
+            if profile is not None and profile.role == 'TEACHER':
+                return view_func(request, *args, **kwargs)
             
             return HttpResponseForbidden("Доступ запрещен. Требуется роль преподавателя.")
         return _wrapped_view
@@ -60,9 +62,9 @@ def admin_required(function=None):
                 from django.contrib.auth.views import redirect_to_login
                 return redirect_to_login(request.get_full_path())
             
-            if hasattr(request.user, 'profile'):
-                if request.user.profile.role == 'ADMIN':
-                    return view_func(request, *args, **kwargs)
+            profile = get_profile(request)
+            if profile is not None and profile.role == 'ADMIN':
+                return view_func(request, *args, **kwargs)
             
             return HttpResponseForbidden("Доступ запрещен. Требуется роль администратора.")
         return _wrapped_view
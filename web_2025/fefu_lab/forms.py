@@ -2,9 +2,44 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.db.models.functions import Lower
+from django.urls import reverse
 from .models import Profile, Course, Enrollment, Instructor
 
 
+class AutocompleteSelect(forms.Widget):
+    """
+    Выбор объекта поиском: строка ввода с подсказками из JSON-ответа
+    url_name ({"results": [{"id", "title", "label"}]}) и скрытое поле с pk.
+    Варианты не выводятся в HTML, поэтому страница не растет вместе с
+    каталогом; запрос к БД нужен только для подписи выбранного объекта.
+    """
+    template_name = 'fefu_lab/widgets/autocomplete.html'
+
+    class Media:
+        js = ['fefu_lab/js/autocomplete.js']
+
+    def __init__(self, url_name, label_field, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.label_field = label_field
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = reverse(self.url_name)
+        context['widget']['label'] = self.selected_label(value)
+        return context
+
+    def selected_label(self, value):
+        # choices — ModelChoiceIterator поля; его queryset не выполняется целиком
+        if value in (None, '') or not hasattr(self, 'choices'):
+            return ''
+        try:
+            return self.choices.queryset.filter(pk=value).values_list(self.label_field, flat=True).first() or ''
+        except (ValueError, TypeError, ValidationError):
+            return ''
+
+
 class CustomAuthenticationForm(AuthenticationForm):
     """Кастомная форма входа с поддержкой email"""
     username = forms.CharField(
@@ -25,7 +60,8 @@ class BaseUserRegistrationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data['email']
-        if User.objects.filter(email=email).exists():
+        # Вход по email не различает регистр, значит и регистрация тоже
+        if User.objects.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exists():
             raise ValidationError("Пользователь с таким email уже зарегистрирован")
         return email
     
@@ -250,13 +286,19 @@ class FeedbackForm(forms.Form):
 
 
 class EnrollmentForm(forms.ModelForm):
-    """Форма записи на курс"""
+    """Форма записи на курс; студента подставляет представление"""
     class Meta:
         model = Enrollment
-        fields = ['student', 'course', 'status', 'grade']
+        fields = ['course', 'status', 'grade']
         widgets = {
-            'student': forms.Select(attrs={'class': 'form-control'}),
-            'course': forms.Select(attrs={'class': 'form-control'}),
+            'course': AutocompleteSelect('course_autocomplete', 'title', attrs={
+                'class': 'form-control',
+                'placeholder': 'Начните вводить название курса',
+            }),
             'status': forms.Select(attrs={'class': 'form-control'}),
             'grade': forms.TextInput(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['course'].queryset = Course.objects.filter(is_active=True)
\ No newline at end of file
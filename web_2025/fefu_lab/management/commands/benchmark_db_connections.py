@@ -0,0 +1,67 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку запроса без пула соединений, с CONN_MAX_AGE и с пулом psycopg'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Количество запросов в каждом сценарии')
+        parser.add_argument('--url', default=None, help='Адрес страницы (по умолчанию список курсов)')
+
+    def handle(self, *args, **options):
+        base = connections['default'].settings_dict
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError('Замер имеет смысл только для PostgreSQL')
+
+        pool_options = base['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 4}
+        scenarios = [
+            ('Новое соединение на каждый запрос', {'CONN_MAX_AGE': 0}, None),
+            ('Постоянное соединение (CONN_MAX_AGE=60)', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}, None),
+            ('Пул psycopg', {'CONN_MAX_AGE': 0}, pool_options),
+        ]
+        url = options['url'] or reverse('course_list')
+        original = connections['default']
+        try:
+            for title, overrides, pool in scenarios:
+                latencies = self.measure(base, overrides, pool, url, options['iterations'])
+                self.stdout.write(
+                    f'{title}: среднее {statistics.mean(latencies):.2f} мс, '
+                    f'p95 {statistics.quantiles(latencies, n=20)[-1]:.2f} мс'
+                )
+        finally:
+            connections['default'] = original
+
+    def measure(self, base, overrides, pool, url, iterations):
+        settings_dict = copy.deepcopy(base)
+        settings_dict.update(overrides)
+        settings_dict['OPTIONS'].pop('pool', None)
+        if pool:
+            settings_dict['OPTIONS']['pool'] = pool
+        connection = connections['default'].__class__(settings_dict, 'default')
+        connections['default'] = connection
+
+        client = Client()
+        latencies = []
+        try:
+            for number in range(iterations):
+                started = time.perf_counter()
+                # Уникальный параметр обходит кэш страниц
+                response = client.get(url, {'benchmark': number})
+                # Как request_finished в настоящем сервере: закрыть соединение
+                # или вернуть его в пул (тестовый Client этот сигнал отключает)
+                close_old_connections()
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url}: ожидался ответ 200, получен {response.status_code}')
+        finally:
+            connection.close()
+            if pool:
+                connection.close_pool()
+        return latencies
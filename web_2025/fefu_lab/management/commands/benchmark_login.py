@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = 'Замеряет число входов в секунду для одного воркера (один процесс, один поток)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Количество входов в каждом сценарии')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        password = 'benchmark-password'
+
+        # Все изменения, включая сессии, откатываются после замера
+        with transaction.atomic():
+            User.objects.create_user('benchmark_login', 'Benchmark.Login@fefu.ru', password)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                make_password(password)
+            hash_rate = iterations / (time.perf_counter() - started)
+            self.stdout.write(f'Одно хэширование пароля: {hash_rate:.1f} в секунду')
+
+            scenarios = [
+                ('Успешный вход по email', 'benchmark.login@FEFU.ru', password, 302),
+                ('Неверный пароль', 'benchmark_login', 'wrong-password', 200),
+                ('Несуществующий пользователь', 'nobody@fefu.ru', password, 200),
+            ]
+            for title, login, secret, expected_status in scenarios:
+                rate = self.measure(login, secret, expected_status, iterations)
+                self.stdout.write(f'{title}: {rate:.1f} входов/с (x{rate / hash_rate:.2f} от одного хэширования)')
+
+            transaction.set_rollback(True)
+
+    def measure(self, login, password, expected_status, iterations):
+        url = reverse('login')
+        started = time.perf_counter()
+        for _ in range(iterations):
+            # Новый клиент — новая сессия, как у отдельного посетителя
+            response = Client().post(url, {'username': login, 'password': password})
+            if response.status_code != expected_status:
+                raise AssertionError(f'{login}: ожидался ответ {expected_status}, получен {response.status_code}')
+        return iterations / (time.perf_counter() - started)
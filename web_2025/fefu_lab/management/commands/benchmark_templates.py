@@ -0,0 +1,75 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.backends.django import DjangoTemplates
+from django.test.utils import override_settings
+from django.utils import timezone
+from fefu_lab.models import Course
+
+
+SOURCE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость рендеринга списка курсов с кэшем шаблонов и без него'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=1000, help='Количество карточек курсов')
+        parser.add_argument('--iterations', type=int, default=20, help='Количество рендеров в каждом режиме')
+
+    def handle(self, *args, **options):
+        # Курсы не сохраняются: замеряется только рендеринг, без запросов к БД
+        now = timezone.now()
+        courses = [
+            Course(
+                pk=i, title=f'Курс {i}', slug=f'course-{i}', description='...', duration=36,
+                level='BEGINNER', price=Decimal('1000.00'), max_students=30,
+                enrolled_students_count=i % 30, updated_at=now
+            )
+            for i in range(1, options['courses'] + 1)
+        ]
+        context = {'courses': courses, 'page': None}
+
+        modes = [
+            ('Без кэша', False, False),
+            ('Кэшированный загрузчик', True, False),
+            ('Загрузчик + кэш фрагментов', True, True),
+        ]
+        results = []
+        for title, cached_loader, fragments in modes:
+            rate = self.measure(context, cached_loader, fragments, options['iterations'])
+            results.append(rate)
+            self.stdout.write(f'{title}: {rate:.1f} рендеров/с ({rate * len(courses):.0f} карточек/с)')
+
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: x{results[-1] / results[0]:.1f}'))
+
+    def measure(self, context, cached_loader, fragments, iterations):
+        loaders = [('django.template.loaders.cached.Loader', SOURCE_LOADERS)] if cached_loader else SOURCE_LOADERS
+        backend = DjangoTemplates({
+            'NAME': 'benchmark',
+            'DIRS': [],
+            'APP_DIRS': False,
+            'OPTIONS': {'loaders': loaders},
+        })
+
+        fragment_cache = settings.CACHES['templates']
+        if not fragments:
+            fragment_cache = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+        with override_settings(CACHES={**settings.CACHES, 'templates': fragment_cache}):
+            caches['templates'].clear()
+            # Прогрев: компиляция шаблонов и заполнение кэша фрагментов
+            backend.get_template('fefu_lab/course_list.html').render(context)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                backend.get_template('fefu_lab/course_list.html').render(context)
+            elapsed = time.perf_counter() - started
+
+        return iterations / elapsed
@@ -0,0 +1,44 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет истекшие сессии небольшими пачками. В отличие от clearsessions '
+        'не удерживает блокировки на всей таблице — можно запускать по расписанию '
+        'при работающем сайте'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Сессий в одной транзакции')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Пауза между пачками, секунды')
+
+    def handle(self, *args, **options):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store, 'get_model_class'):
+            # cache и signed_cookies не хранят сессии в БД, они истекают сами
+            self.stdout.write(f'{settings.SESSION_ENGINE} не хранит сессии в БД, очищать нечего')
+            return
+
+        model = store.get_model_class()
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # Выборка по индексу expire_date, удаление по первичному ключу:
+            # каждая пачка — короткая отдельная транзакция в режиме autocommit
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+            if len(keys) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено истекших сессий: {deleted}'))
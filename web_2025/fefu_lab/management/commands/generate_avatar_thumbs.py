@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from fefu_lab.avatars import generate_avatar_thumbnails, thumbnails_ready
+from fefu_lab.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для уже загруженных аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать существующие миниатюры')
+
+    def handle(self, *args, **options):
+        names = Profile.objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('avatar', flat=True)
+        created = failed = 0
+        for name in names.iterator():
+            if not options['force'] and thumbnails_ready(name):
+                continue
+            try:
+                generate_avatar_thumbnails(name)
+                created += 1
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Создано миниатюр: {created}, ошибок: {failed}'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from fefu_lab.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики активных записей на курсы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не изменяя'
+        )
+
+    def handle(self, *args, **options):
+        active_count = (
+            Enrollment.objects
+            .filter(course=OuterRef('pk'), status='ACTIVE')
+            .order_by()
+            .values('course')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+
+        with transaction.atomic():
+            courses = (
+                Course.objects
+                .select_for_update()
+                .annotate(actual_count=Coalesce(Subquery(active_count), 0))
+                .only('pk', 'title', 'enrolled_students_count')
+            )
+            drifted = [c for c in courses if c.enrolled_students_count != c.actual_count]
+
+            for course in drifted:
+                self.stdout.write(
+                    f'{course.title}: {course.enrolled_students_count} -> {course.actual_count}'
+                )
+                if not options['dry_run']:
+                    Course.objects.filter(pk=course.pk).update(
+                        enrolled_students_count=course.actual_count
+                    )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Найдено расхождений: {len(drifted)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено счетчиков: {len(drifted)}'))
@@ -1,175 +1,277 @@
-import os
-import sys
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from django.contrib.auth.models import User
-from fefu_lab.models import Student, Course, Enrollment
+import math
+import random
+import re
+import time
 from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from fefu_lab.models import Profile, Instructor, Course, Enrollment
+from fefu_lab.page_cache import purge_tags
+from fefu_lab.search import refresh_search_names, refresh_search_vectors
+from fefu_lab.stats import invalidate_site_stats
+
+
+FIRST_NAMES = [
+    'Александр', 'Анна', 'Дмитрий', 'Екатерина', 'Иван', 'Мария', 'Михаил', 'Ольга',
+    'Сергей', 'Татьяна', 'Андрей', 'Елена', 'Алексей', 'Наталья', 'Максим', 'Юлия',
+]
+LAST_NAMES = [
+    'Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Новиков',
+    'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров', 'Павлов',
+]
+COURSE_TOPICS = [
+    'Python', 'JavaScript', 'Django', 'Базы данных', 'Веб-безопасность', 'Алгоритмы',
+    'Машинное обучение', 'Компьютерные сети', 'Linux', 'Криптография', 'DevOps', 'Go',
+]
+COURSE_KINDS = ['Основы', 'Практикум', 'Продвинутый курс', 'Интенсив', 'Спецкурс']
+SPECIALIZATIONS = ['Кибербезопасность', 'Веб-разработка', 'Анализ данных', 'Системное программирование']
+GRADES = ['3', '4', '5']
+
+# Демо-аккаунты из прежней версии команды
+DEMO_ACCOUNTS = [
+    ('admin1', 'admin@fefu.ru', 'Администратор', 'Системы', 'ADMIN'),
+    ('teacher1', 'teacher1@fefu.ru', 'Иван', 'Петров', 'TEACHER'),
+    ('teacher2', 'teacher2@fefu.ru', 'Мария', 'Сидорова', 'TEACHER'),
+    ('anna', 'anna@fefu.ru', 'Анна', 'Иванова', 'STUDENT'),
+]
+
 
 class Command(BaseCommand):
-    help = 'Заполняет базу данных тестовыми данными'
-    
+    help = 'Заполняет базу данных тестовыми данными заданного объема'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50, help='Количество студентов')
+        parser.add_argument('--teachers', type=int, default=None,
+                            help='Количество преподавателей (по умолчанию courses / 10)')
+        parser.add_argument('--courses', type=int, default=10, help='Количество курсов')
+        parser.add_argument('--enrollments', type=int, default=150, help='Количество записей на курсы')
+        parser.add_argument('--seed', type=int, default=2025, help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--password', default='password123', help='Пароль всех пользователей')
+        parser.add_argument('--no-clear', action='store_true', help='Не удалять существующие данные')
+
     def handle(self, *args, **options):
-        self.stdout.write('Создание тестовых данных...')
-        
-        # Очищаем существующие данные
-        Enrollment.objects.all().delete()
-        Course.objects.all().delete()
-        Student.objects.all().delete()
-        User.objects.filter(is_superuser=False).delete()
-        
-        # Создаем пользователей и профили
-        users_data = [
-            {
-                'username': 'teacher1',
-                'email': 'teacher1@fefu.ru',
-                'first_name': 'Иван',
-                'last_name': 'Петров',
-                'role': 'TEACHER',
-                'faculty': 'CS',
-                'specialization': 'Кибербезопасность'
-            },
-            {
-                'username': 'teacher2',
-                'email': 'teacher2@fefu.ru',
-                'first_name': 'Мария',
-                'last_name': 'Сидорова',
-                'role': 'TEACHER',
-                'faculty': 'IT',
-                'specialization': 'Веб-разработка'
-            },
-            {
-                'username': 'admin1',
-                'email': 'admin@fefu.ru',
-                'first_name': 'Администратор',
-                'last_name': 'Системы',
-                'role': 'ADMIN',
-                'faculty': 'CS'
-            }
-        ]
-        
-        teachers = []
-        for user_data in users_data:
-            user = User.objects.create_user(
-                username=user_data['username'],
-                email=user_data['email'],
-                password='password123',  # Простой пароль для тестирования
-                first_name=user_data['first_name'],
-                last_name=user_data['last_name']
-            )
-            
-            student = Student.objects.create(
-                user=user,
-                first_name=user_data['first_name'],
-                last_name=user_data['last_name'],
-                email=user_data['email'],
-                role=user_data['role'],
-                faculty=user_data['faculty']
-            )
-            
-            if user_data['role'] == 'TEACHER':
-                teachers.append(student)
-            
-            self.stdout.write(f'Создан пользователь: {user.username} ({user_data["role"]})')
-        
-        # Создаем студентов
-        students_data = [
-            {'first_name': 'Анна', 'last_name': 'Иванова', 'email': 'anna@fefu.ru', 'faculty': 'CS'},
-            {'first_name': 'Дмитрий', 'last_name': 'Смирнов', 'email': 'dmitry@fefu.ru', 'faculty': 'SE'},
-            {'first_name': 'Екатерина', 'last_name': 'Попова', 'email': 'ekaterina@fefu.ru', 'faculty': 'IT'},
-            {'first_name': 'Михаил', 'last_name': 'Васильев', 'email': 'mikhail@fefu.ru', 'faculty': 'DS'},
-            {'first_name': 'Ольга', 'last_name': 'Новикова', 'email': 'olga@fefu.ru', 'faculty': 'WEB'},
-        ]
-        
-        students = []
-        for student_data in students_data:
-            # Создаем пользователя для студента
-            username = student_data['email'].split('@')[0]
-            user = User.objects.create_user(
-                username=username,
-                email=student_data['email'],
-                password='password123',
-                first_name=student_data['first_name'],
-                last_name=student_data['last_name']
-            )
-            
-            student = Student.objects.create(
-                user=user,
-                first_name=student_data['first_name'],
-                last_name=student_data['last_name'],
-                email=student_data['email'],
-                role='STUDENT',
-                faculty=student_data['faculty'],
-                birth_date=date(2000, 5, 15)
-            )
-            students.append(student)
-        
-        # Создаем курсы
-        courses = [
-            {
-                'title': 'Основы Python',
-                'slug': 'python-basics',
-                'description': 'Базовый курс по программированию на языке Python.',
-                'duration': 36,
-                'instructor': teachers[0],
-                'level': 'BEGINNER',
-                'max_students': 25,
-                'price': 0
-            },
-            {
-                'title': 'Веб-безопасность',
-                'slug': 'web-security',
-                'description': 'Продвинутый курс по защите веб-приложений.',
-                'duration': 48,
-                'instructor': teachers[0],
-                'level': 'ADVANCED',
-                'max_students': 20,
-                'price': 15000
-            },
-            {
-                'title': 'Современный JavaScript',
-                'slug': 'modern-javascript',
-                'description': 'Изучение современных возможностей JavaScript.',
-                'duration': 42,
-                'instructor': teachers[1],
-                'level': 'INTERMEDIATE',
-                'max_students': 30,
-                'price': 12000
-            },
-        ]
-        
-        created_courses = []
-        for course_data in courses:
-            course = Course.objects.create(**course_data)
-            created_courses.append(course)
-        
-        # Создаем записи на курсы
-        enrollments = [
-            {'student': students[0], 'course': created_courses[0], 'status': 'ACTIVE'},
-            {'student': students[0], 'course': created_courses[1], 'status': 'ACTIVE'},
-            {'student': students[1], 'course': created_courses[0], 'status': 'ACTIVE'},
-            {'student': students[1], 'course': created_courses[2], 'status': 'ACTIVE'},
-            {'student': students[2], 'course': created_courses[0], 'status': 'ACTIVE'},
-            {'student': students[3], 'course': created_courses[1], 'status': 'ACTIVE'},
-            {'student': students[4], 'course': created_courses[2], 'status': 'ACTIVE'},
-        ]
-        
-        for enrollment_data in enrollments:
-            Enrollment.objects.create(**enrollment_data)
-        
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        students = options['students']
+        courses = options['courses']
+        enrollments = options['enrollments']
+        teachers = options['teachers'] if options['teachers'] is not None else max(1, courses // 10)
+
+        if min(students, courses, teachers, enrollments) < 0:
+            raise CommandError('Объемы данных не могут быть отрицательными')
+        if enrollments and (not students or not courses):
+            raise CommandError('Для записей на курсы нужны студенты и курсы')
+        if enrollments > students * courses:
+            raise CommandError('Записей больше, чем возможных пар студент-курс')
+
+        # Хэш пароля считаем один раз: PBKDF2 на каждого пользователя занял бы часы
+        self.password_hash = make_password(options['password'])
+        started = time.monotonic()
+
+        with transaction.atomic():
+            if not options['no_clear']:
+                self.clear()
+            demo = self.create_demo_accounts()
+            instructor_ids = demo['TEACHER'] + self.create_teachers(teachers)
+            student_ids = demo['STUDENT'] + self.create_students(students)
+            # bulk_create обходит Profile.save — строку поиска людей заполняем сами
+            refresh_search_names(Profile.objects.all())
+            course_ids = self.create_courses(courses, instructor_ids)
+            self.create_enrollments(enrollments, student_ids, course_ids)
+
+        # bulk_create не отправляет сигналы — сбрасываем кэши вручную
+        invalidate_site_stats()
+        purge_tags('courses', 'students', 'instructors')
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Успешно создано: {User.objects.count()} пользователей, '
-                f'{Student.objects.count()} профилей, {Course.objects.count()} курсов, '
+                f'Успешно создано за {time.monotonic() - started:.1f} с: {User.objects.count()} пользователей, '
+                f'{Profile.objects.count()} профилей, {Course.objects.count()} курсов, '
                 f'{Enrollment.objects.count()} записей на курсы'
             )
         )
-        
         self.stdout.write(
             self.style.WARNING(
                 '\nТестовые учетные данные:\n'
-                'Администратор: admin@fefu.ru / password123\n'
-                'Преподаватель: teacher1@fefu.ru / password123\n'
-                'Студент: anna@fefu.ru / password123'
+                f'Администратор: admin@fefu.ru / {options["password"]}\n'
+                f'Преподаватель: teacher1@fefu.ru / {options["password"]}\n'
+                f'Студент: anna@fefu.ru / {options["password"]}'
+            )
+        )
+
+    def clear(self):
+        """Удалить данные приложения без загрузки объектов и сигналов на каждую строку"""
+        self.stdout.write('Очистка существующих данных...')
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in (Enrollment, Course, Instructor):
+                cursor.execute(f'DELETE FROM {quote(model._meta.db_table)}')
+            cursor.execute(
+                f'DELETE FROM {quote(Profile._meta.db_table)} WHERE user_id IN '
+                f'(SELECT id FROM {quote(User._meta.db_table)} WHERE NOT is_superuser)'
+            )
+        User.objects.filter(is_superuser=False).delete()
+
+    def bulk_create(self, model, objects):
+        """bulk_create пачками; возвращает pk созданных объектов"""
+        ids = []
+        for start in range(0, len(objects), self.batch_size):
+            batch = model.objects.bulk_create(objects[start:start + self.batch_size])
+            ids.extend(obj.pk for obj in batch)
+        return ids
+
+    def next_number(self, queryset, field, prefix):
+        """Номер после наибольшего из существующих значений вида prefix<N> (для --no-clear)"""
+        pattern = re.compile(re.escape(prefix) + r'(\d+)$')
+        numbers = [0]
+        for value in queryset.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True).iterator():
+            match = pattern.match(value)
+            if match:
+                numbers.append(int(match.group(1)))
+        return max(numbers) + 1
+
+    def create_users(self, prefix, count):
+        start = self.next_number(User.objects.all(), 'username', prefix)
+        users = [
+            User(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@fefu.ru',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                password=self.password_hash,
+            )
+            for i in range(start, start + count)
+        ]
+        user_ids = self.bulk_create(User, users)
+        if None in user_ids:
+            # Бэкенд не возвращает pk из bulk_create — читаем их отдельно
+            user_ids = list(
+                User.objects.filter(username__in=[u.username for u in users]).order_by('pk').values_list('pk', flat=True)
+            )
+        return user_ids
+
+    def create_profiles(self, user_ids, role):
+        profiles = []
+        for user_id in user_ids:
+            profile = Profile(user_id=user_id, role=role)
+            if role == 'STUDENT':
+                profile.student_id = f'S{user_id:08d}'
+                profile.faculty = self.rng.choice(Profile.FACULTY_CHOICES)[0]
+                profile.year_of_study = self.rng.randint(1, 6)
+                profile.birth_date = date(1998, 1, 1) + timedelta(days=self.rng.randint(0, 3650))
+            elif role == 'TEACHER':
+                profile.specialization = self.rng.choice(SPECIALIZATIONS)
+                profile.degree = self.rng.choice(['', 'Кандидат наук', 'Доктор наук'])
+            elif role == 'ADMIN':
+                profile.admin_level = 'SUPER_ADMIN'
+            profiles.append(profile)
+        return self.bulk_create(Profile, profiles)
+
+    def create_demo_accounts(self):
+        demo = {'STUDENT': [], 'TEACHER': [], 'ADMIN': []}
+        for username, email, first_name, last_name, role in DEMO_ACCOUNTS:
+            user, created = User.objects.get_or_create(username=username, defaults={
+                'email': email, 'first_name': first_name, 'last_name': last_name,
+                'password': self.password_hash, 'is_staff': role == 'ADMIN',
+            })
+            # С --no-clear аккаунт уже может быть создан прошлым запуском
+            profile = None if created else Profile.objects.filter(user=user).first()
+            profile_id = profile.pk if profile else self.create_profiles([user.pk], role)[0]
+            if role == 'TEACHER':
+                instructor, _ = Instructor.objects.get_or_create(profile_id=profile_id)
+                demo[role].append(instructor.pk)
+            else:
+                demo[role].append(profile_id)
+        return demo
+
+    def create_teachers(self, count):
+        self.stdout.write(f'Преподаватели: {count}')
+        profile_ids = self.create_profiles(self.create_users('teacher_gen', count), 'TEACHER')
+        return self.bulk_create(Instructor, [Instructor(profile_id=pk) for pk in profile_ids])
+
+    def create_students(self, count):
+        self.stdout.write(f'Студенты: {count}')
+        return self.create_profiles(self.create_users('student', count), 'STUDENT')
+
+    def create_courses(self, count, instructor_ids):
+        self.stdout.write(f'Курсы: {count}')
+        start = self.next_number(Course.objects.all(), 'slug', 'course-')
+        courses = [
+            Course(
+                title=f'{self.rng.choice(COURSE_KINDS)} {self.rng.choice(COURSE_TOPICS)} №{i}',
+                slug=f'course-{i}',
+                description='Курс создан генератором тестовых данных.',
+                duration=self.rng.randint(8, 120),
+                instructor_id=self.rng.choice(instructor_ids) if instructor_ids else None,
+                level=self.rng.choice(Course.LEVEL_CHOICES)[0],
+                max_students=self.rng.randint(10, 100),
+                price=Decimal(self.rng.choice([0, 5000, 10000, 15000])),
+                is_active=self.rng.random() > 0.1,
             )
-        )
\ No newline at end of file
+            for i in range(start, start + count)
+        ]
+        course_ids = self.bulk_create(Course, courses)
+        # bulk_create обходит post_save — поисковый индекс заполняем сами
+        refresh_search_vectors(Course.objects.filter(pk__in=course_ids))
+        self.capacity = dict(zip(course_ids, (c.max_students for c in courses)))
+        return course_ids
+
+    def create_enrollments(self, count, student_ids, course_ids):
+        """
+        Записи генерируются потоком: студент s получает курсы
+        (offset_s + j * step) mod C, где step взаимно прост с C, поэтому
+        пары не повторяются. Активных записей не больше max_students курса,
+        остальные становятся завершенными.
+        """
+        self.stdout.write(f'Записи на курсы: {count}')
+        total_courses = len(course_ids)
+        step = self.coprime_step(total_courses)
+        per_student, extra = divmod(count, len(student_ids)) if student_ids else (0, 0)
+        active = dict.fromkeys(course_ids, 0)
+        now = timezone.now()
+
+        batch = []
+        for index, student_id in enumerate(student_ids):
+            offset = self.rng.randrange(total_courses)
+            for j in range(per_student + (1 if index < extra else 0)):
+                course_id = course_ids[(offset + j * step) % total_courses]
+                status = self.rng.choices(['ACTIVE', 'COMPLETED', 'CANCELLED'], weights=[7, 2, 1])[0]
+                if status == 'ACTIVE':
+                    if active[course_id] < self.capacity[course_id]:
+                        active[course_id] += 1
+                    else:
+                        status = 'COMPLETED'
+                completed = status == 'COMPLETED'
+                batch.append(Enrollment(
+                    student_id=student_id,
+                    course_id=course_id,
+                    status=status,
+                    grade=self.rng.choice(GRADES) if completed else None,
+                    completed_at=now if completed else None,
+                ))
+                if len(batch) >= self.batch_size:
+                    Enrollment.objects.bulk_create(batch)
+                    batch = []
+        if batch:
+            Enrollment.objects.bulk_create(batch)
+
+        # Счетчики курсов известны заранее, пересчет не нужен
+        Course.objects.bulk_update(
+            [Course(pk=course_id, enrolled_students_count=n) for course_id, n in active.items() if n],
+            ['enrolled_students_count'],
+            batch_size=self.batch_size,
+        )
+
+    def coprime_step(self, n):
+        if n <= 1:
+            return 1
+        step = self.rng.randrange(1, n)
+        while math.gcd(step, n) != 1:
+            step += 1
+        return step
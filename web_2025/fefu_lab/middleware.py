@@ -0,0 +1,131 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.functional import SimpleLazyObject
+
+from .routers import mark_sticky, needs_primary, use_primary
+
+
+def get_profile(request):
+    """
+    Профиль текущего пользователя или None.
+
+    Вычисляется один раз за запрос. EmailBackend.get_user загружает
+    пользователя сразу с профилем и записью преподавателя, поэтому
+    проверки ролей в декораторах и views не делают запросов к БД.
+    """
+    if not hasattr(request, '_cached_profile'):
+        user = request.user
+        request._cached_profile = getattr(user, 'profile', None) if user.is_authenticated else None
+    return request._cached_profile
+
+
+async def aresolve_user(request):
+    """
+    Загрузить пользователя без блокировки цикла событий и заменить им
+    ленивый request.user: после этого шаблоны и get_profile() в
+    async-представлениях не обращаются к БД синхронно.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+def serves_async(request):
+    """
+    Запрос пришел через ASGI. Потоковому ответу тогда нужен асинхронный
+    итератор: синхронный Django прочитает целиком в память до отправки
+    (и наоборот под WSGI).
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def set_profile(request, profile):
+    """Запомнить профиль, созданный во время запроса"""
+    request._cached_profile = profile
+    request.profile = profile
+
+
+class ProfileMiddleware:
+    """
+    Добавляет request.profile — ленивую ссылку на профиль пользователя
+    (None для анонимных и пользователей без профиля).
+    Должен стоять после AuthenticationMiddleware. Под ASGI пользователь
+    загружается заранее через aresolve_user().
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await aresolve_user(request)
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Запросы с записью и запросы клиента в течение REPLICA_STICKY_SECONDS
+    после них читают с основной БД (PrimaryReplicaRouter), остальные — с реплик.
+    Должен стоять перед SessionMiddleware, чтобы сессия и пользователь
+    читались из той же БД.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if needs_primary(request):
+            with use_primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        return mark_sticky(request, response)
+
+    async def __acall__(self, request):
+        if needs_primary(request):
+            with use_primary():
+                response = await self.get_response(request)
+        else:
+            response = await self.get_response(request)
+        return mark_sticky(request, response)
+
+
+class AsgiUrlconfMiddleware:
+    """
+    Запросы через ASGI разрешаются по settings.ASGI_URLCONF, где страницы
+    для чтения — async-представления. Под WSGI остается ROOT_URLCONF с
+    синхронными: async-представление там шло бы через async_to_sync.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if serves_async(request):
+            request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
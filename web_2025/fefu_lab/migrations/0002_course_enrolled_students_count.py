@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_enrolled_students_count(apps, schema_editor):
+    Course = apps.get_model('fefu_lab', 'Course')
+    Enrollment = apps.get_model('fefu_lab', 'Enrollment')
+    active_count = (
+        Enrollment.objects
+        .filter(course=OuterRef('pk'), status='ACTIVE')
+        .order_by()
+        .values('course')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Course.objects.update(enrolled_students_count=Coalesce(Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_students_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Записанных студентов'),
+        ),
+        migrations.RunPython(fill_enrolled_students_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:25
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+# auth.User принадлежит другому приложению, поэтому индекс создается
+# через schema_editor, а не через Meta.indexes
+EMAIL_LOWER_INDEX = models.Index(Lower('email'), name='auth_user_email_lower_idx')
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_LOWER_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_LOWER_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0003_filter_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
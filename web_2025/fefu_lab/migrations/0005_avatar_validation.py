@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:29
+
+import fefu_lab.avatars
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0004_user_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to='avatars/', validators=[fefu_lab.avatars.validate_avatar], verbose_name='Аватар'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:02
+
+import django.contrib.postgres.search
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+# GIN-индекс поддерживает только PostgreSQL, поэтому он создается через
+# schema_editor, а не через Meta.indexes, и в SQLite пропускается
+SEARCH_VECTOR_INDEX = GinIndex(fields=['search_vector'], name='courses_search_vector_idx')
+
+
+def add_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Course = apps.get_model('fefu_lab', 'Course')
+    # Копия fefu_lab.search.COURSE_SEARCH_VECTOR на момент миграции: ее
+    # результат не должен меняться вместе с кодом приложения
+    Course.objects.using(schema_editor.connection.alias).update(search_vector=(
+        SearchVector('title', weight='A', config='russian')
+        + SearchVector('description', weight='B', config='russian')
+    ))
+    schema_editor.add_index(Course, SEARCH_VECTOR_INDEX)
+
+
+def remove_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('fefu_lab', 'Course'), SEARCH_VECTOR_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0006_enrollment_recent_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:55
+
+import warnings
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+
+# Индекс триграмм ускоряет и similarity, и LIKE '%...%'. Расширение pg_trgm
+# входит в postgresql-contrib; без него поиск людей работает через LIKE
+SEARCH_NAME_INDEX = GinIndex(fields=['search_name'], opclasses=['gin_trgm_ops'], name='profiles_search_name_trgm_idx')
+
+
+def fill_search_names(apps, schema_editor):
+    # Копия fefu_lab.search.refresh_search_names на момент миграции: ее
+    # результат не должен меняться вместе с кодом приложения
+    Profile = apps.get_model('fefu_lab', 'Profile')
+    profiles = Profile.objects.using(schema_editor.connection.alias)
+    batch = []
+    for profile in profiles.select_related('user').order_by('pk').iterator(chunk_size=2000):
+        parts = [profile.user.last_name, profile.user.first_name, profile.user.email, profile.student_id]
+        text = ' '.join(part for part in parts if part)
+        profile.search_name = ' '.join(text.lower().replace('ё', 'е').split())
+        batch.append(profile)
+        if len(batch) == 2000:
+            profiles.bulk_update(batch, ['search_name'])
+            batch = []
+    if batch:
+        profiles.bulk_update(batch, ['search_name'])
+
+
+def add_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            warnings.warn('Расширение pg_trgm недоступно: поиск людей будет работать без индекса триграмм')
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(apps.get_model('fefu_lab', 'Profile'), SEARCH_NAME_INDEX)
+
+
+def remove_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Расширение не удаляем: им могут пользоваться другие объекты БД
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_NAME_INDEX.name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fefu_lab', '0007_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=600),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+        migrations.RunPython(add_trigram_index, remove_trigram_index),
+    ]
@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from .avatars import AvatarThumbnail, validate_avatar
+from .search import people_search_name
+
 class Profile(models.Model):
     """Модель профиля пользователя"""
     ROLE_CHOICES = [
@@ -47,6 +53,7 @@ class Profile(models.Model):
         upload_to='avatars/',
         null=True, 
         blank=True,
+        validators=[validate_avatar],
         verbose_name='Аватар'
     )
     
@@ -137,12 +144,18 @@ class Profile(models.Model):
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    # ФИО, email и номер студенческого в нижнем регистре для поиска людей
+    # без JOIN с auth_user; GIN-индекс pg_trgm создает миграция 0008
+    search_name = models.CharField(max_length=600, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Профиль'
         verbose_name_plural = 'Профили'
         ordering = ['user__last_name', 'user__first_name']
         db_table = 'profiles'
+        indexes = [
+            models.Index(fields=['role', 'is_active'], name='profiles_role_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.get_role_display()})"
@@ -155,6 +168,11 @@ class Profile(models.Model):
     def email(self):
         return self.user.email
 
+    @property
+    def avatar_thumb(self):
+        """Миниатюра аватара для карточек профиля"""
+        return AvatarThumbnail(self.avatar) if self.avatar else None
+
     def get_role_display_name(self):
         return dict(self.ROLE_CHOICES).get(self.role, 'Неизвестно')
 
@@ -167,6 +185,15 @@ class Profile(models.Model):
     def get_absolute_url(self):
         return reverse('student_detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        # Смену имени и email в User отслеживает сигнал в fefu_lab.search
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'student_id' in update_fields:
+            self.search_name = people_search_name(self.user, self.student_id)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_name'}
+        super().save(*args, **kwargs)
+
 
 # # Сигнал для автоматического создания профиля при создании пользователя
 # @receiver(post_save, sender=User)
@@ -276,15 +303,29 @@ class Course(models.Model):
         default=0,
         verbose_name='Стоимость'
     )
+    # Денормализованный счетчик активных записей, поддерживается Enrollment
+    enrolled_students_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Записанных студентов'
+    )
     is_active = models.BooleanField(default=True, verbose_name='Активен')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    # Название и описание для полнотекстового поиска (PostgreSQL), заполняется
+    # в fefu_lab.search после сохранения; GIN-индекс создает миграция 0007
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Курс'
         verbose_name_plural = 'Курсы'
         ordering = ['title']
         db_table = 'courses'
+        indexes = [
+            # Частичные индексы: публичные страницы показывают только активные курсы
+            models.Index(fields=['title', 'id'], condition=Q(is_active=True), name='courses_active_title_idx'),
+            models.Index(fields=['-created_at'], condition=Q(is_active=True), name='courses_active_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -292,15 +333,20 @@ class Course(models.Model):
     def get_absolute_url(self):
         return reverse('course_detail', kwargs={'slug': self.slug})
 
-    @property
-    def enrolled_students_count(self):
-        return self.enrollments.filter(status='ACTIVE').count()
-
     @property
     def available_slots(self):
         return self.max_students - self.enrolled_students_count
 
 
+def shift_enrolled_count(course_id, delta):
+    """Атомарно изменить счетчик записей курса на delta"""
+    if not course_id or not delta:
+        return
+    Course.objects.filter(pk=course_id).update(
+        enrolled_students_count=Greatest(F('enrolled_students_count') + delta, 0)
+    )
+
+
 class Enrollment(models.Model):
     """Модель записи на курс"""
     STATUS_CHOICES = [
@@ -343,6 +389,17 @@ class Enrollment(models.Model):
         unique_together = ['student', 'course']
         ordering = ['-enrolled_at']
         db_table = 'enrollments'
+        indexes = [
+            models.Index(fields=['student', 'status'], name='enrollments_student_status_idx'),
+            models.Index(fields=['course', 'status'], name='enrollments_course_status_idx'),
+            models.Index(
+                fields=['course', '-enrolled_at'],
+                condition=Q(status='ACTIVE'),
+                name='enrollments_active_course_idx'
+            ),
+            # Порядок списка записей в админке: -enrolled_at, -pk
+            models.Index(fields=['-enrolled_at', '-id'], name='enrollments_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.course}"
@@ -351,4 +408,38 @@ class Enrollment(models.Model):
         if self.status == 'COMPLETED' and not self.completed_at:
             from django.utils import timezone
             self.completed_at = timezone.now()
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        # Счетчик курса зависит только от курса и статуса записи
+        update_fields = kwargs.get('update_fields')
+        tracks_counter = update_fields is None or bool({'status', 'course', 'course_id'} & set(update_fields))
+        with transaction.atomic():
+            old_course_id, old_status = None, None
+            if tracks_counter and not self._state.adding:
+                # Прежнее состояние читаем под блокировкой строки: по копии в
+                # памяти два одновременных сохранения сдвинули бы счетчик дважды
+                old_course_id, old_status = (
+                    Enrollment.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('course_id', 'status')
+                    .first()
+                ) or (None, None)
+            super().save(*args, **kwargs)
+            if tracks_counter:
+                # Поддерживаем счетчик активных записей курса
+                was_active = old_status == 'ACTIVE'
+                is_active = self.status == 'ACTIVE'
+                if old_course_id != self.course_id or was_active != is_active:
+                    if was_active:
+                        shift_enrolled_count(old_course_id, -1)
+                    if is_active:
+                        shift_enrolled_count(self.course_id, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def decrement_enrolled_count(sender, instance, origin=None, **kwargs):
+    """Уменьшаем счетчик курса при удалении активной записи"""
+    # При каскадном удалении самого курса обновлять нечего
+    if isinstance(origin, Course) and origin.pk == instance.course_id:
+        return
+    if instance.status == 'ACTIVE':
+        shift_enrolled_count(instance.course_id, -1)
\ No newline at end of file
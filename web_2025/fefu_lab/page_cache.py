@@ -0,0 +1,282 @@
+import hashlib
+import os
+import threading
+import time
+from functools import lru_cache, wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib import messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.template.utils import get_app_template_dirs
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from .middleware import aresolve_user, get_profile
+from .models import Profile, Instructor, Course, Enrollment
+from .routers import use_primary
+
+
+PAGE_KEY_PREFIX = 'fefu_lab:page:'
+TAG_KEY_PREFIX = 'fefu_lab:tag:'
+
+
+def tag_versions(tags):
+    """
+    Текущие версии тегов. Версия входит в ключ страницы, поэтому
+    увеличение версии делает все страницы с этим тегом недоступными.
+    """
+    keys = [TAG_KEY_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начинаем со времени, а не с нуля: вытесненная из кэша версия
+            # не должна совпасть со старой и вернуть устаревшую страницу
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def purge_tags(*tags):
+    """Сбросить кэш всех страниц, помеченных любым из тегов"""
+    def purge():
+        for tag in tags:
+            try:
+                cache.incr(TAG_KEY_PREFIX + tag)
+            except ValueError:
+                cache.set(TAG_KEY_PREFIX + tag, time.time_ns(), None)
+    transaction.on_commit(purge)
+
+
+def page_cache_key(request, tags):
+    versions = ':'.join(str(version) for version in tag_versions(tags))
+    raw = f'{versions}|{get_language()}|{request.build_absolute_uri()}'
+    return PAGE_KEY_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+
+def page_tags_for(tags, args, kwargs):
+    return tags(*args, **kwargs) if callable(tags) else tags
+
+
+def bypasses_page_cache(request):
+    return (
+        request.method not in ('GET', 'HEAD')
+        or request.user.is_authenticated
+        or len(messages.get_messages(request))
+    )
+
+
+def prepare_for_cache(request, response):
+    """Подготовить ответ к сохранению; False — ответ кэшировать нельзя"""
+    patch_vary_headers(response, ['Cookie', 'Accept-Language'])
+    # Ответы с cookie или CSRF-токеном персональны и не кэшируются
+    if (
+        response.status_code != 200
+        or response.streaming
+        or response.cookies
+        or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    ):
+        return False
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return True
+
+
+def cache_anonymous_page(tags=(), timeout=None):
+    """
+    Кэшировать страницу целиком для анонимных посетителей.
+
+    tags — список тегов или функция от аргументов view, возвращающая
+    список; сброс тега через purge_tags() удаляет все такие страницы.
+    Авторизованные пользователи и запросы с непоказанными сообщениями
+    всегда обрабатываются view без кэша. При промахе view читает с основной
+    БД: страница попадет в кэш, и отставание реплики сохранилось бы в ней
+    до следующего сброса тегов. Поддерживает async-представления.
+    """
+    def get_timeout():
+        return timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 60)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                await aresolve_user(request)
+                if bypasses_page_cache(request):
+                    return await view_func(request, *args, **kwargs)
+
+                key = await sync_to_async(page_cache_key)(request, page_tags_for(tags, args, kwargs))
+                response = await cache.aget(key)
+                if response is not None:
+                    return response
+
+                with use_primary():
+                    response = await view_func(request, *args, **kwargs)
+                if prepare_for_cache(request, response):
+                    await cache.aset(key, response, get_timeout())
+                return response
+            return _wrapped_async_view
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if bypasses_page_cache(request):
+                return view_func(request, *args, **kwargs)
+
+            key = page_cache_key(request, page_tags_for(tags, args, kwargs))
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            with use_primary():
+                response = view_func(request, *args, **kwargs)
+            if prepare_for_cache(request, response):
+                cache.set(key, response, get_timeout())
+            return response
+        return _wrapped_view
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def templates_version():
+    """Версия шаблонов — самое позднее время изменения файла; меняется при деплое"""
+    latest = 0
+    for directory in get_app_template_dirs('templates'):
+        for root, _, files in os.walk(directory):
+            for name in files:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return latest
+
+
+def conditional_page(tags=()):
+    """
+    Слабый ETag страницы и ответ 304 Not Modified до вызова view.
+
+    ETag строится из версий тегов (их увеличивает purge_tags() при любом
+    изменении данных страницы), пользователя и его прав в меню, языка, версии
+    шаблонов и манифеста статики, поэтому проверка не делает запросов к БД.
+    Запросы с непоказанными сообщениями не получают ETag.
+    Для async-представлений пользователь загружается до вычисления ETag.
+    """
+    def etag_func(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return None
+        page_tags = page_tags_for(tags, args, kwargs)
+        user = request.user
+        profile = get_profile(request) if user.is_authenticated else None
+        raw = '|'.join(str(part) for part in (
+            *tag_versions(page_tags),
+            user.pk,
+            user.is_staff,
+            profile.role if profile is not None else '',
+            get_language(),
+            templates_version(),
+            getattr(staticfiles_storage, 'manifest_hash', ''),
+        ))
+        return 'W/"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+        if not iscoroutinefunction(view_func):
+            return conditional_view
+
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            await aresolve_user(request)
+            return await conditional_view(request, *args, **kwargs)
+        return _wrapped_async_view
+
+    return decorator
+
+
+_pending_courses = threading.local()
+
+
+def purge_course_pages(course_id, slug=None):
+    """
+    Сбросить страницу курса после коммита. Курсы копятся до коммита, и
+    при каскадном удалении сотен записей страницы сбрасываются один раз,
+    а неизвестные slug читаются одним запросом.
+    """
+    pending = _pending_courses.__dict__.setdefault('courses', {})
+    if slug or course_id not in pending:
+        pending[course_id] = slug
+    # Регистрация дешевая; после отката накопленное сбросит следующий коммит
+    transaction.on_commit(flush_course_pages)
+
+
+def flush_course_pages():
+    pending = _pending_courses.__dict__.pop('courses', None)
+    if not pending:
+        return
+    slugs = {slug for slug in pending.values() if slug}
+    unknown = [course_id for course_id, slug in pending.items() if not slug]
+    if unknown:
+        slugs.update(Course.objects.filter(pk__in=unknown).values_list('slug', flat=True))
+    purge_tags('courses', *(f'course:{slug}' for slug in sorted(slugs)))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_slug(sender, instance, **kwargs):
+    # После смены slug страница со старым адресом тоже должна сброситься
+    instance._old_slug = None
+    if not instance._state.adding:
+        instance._old_slug = Course.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_pages_changed(sender, instance, **kwargs):
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug and old_slug != instance.slug:
+        purge_tags('courses', f'course:{instance.slug}', f'course:{old_slug}')
+    else:
+        purge_tags('courses', f'course:{instance.slug}')
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_pages_changed(sender, instance, origin=None, **kwargs):
+    # При удалении самого курса страницы сбросит course_pages_changed
+    if isinstance(origin, Course):
+        return
+    # Меняется число записанных и список студентов на странице курса;
+    # курс без запроса к БД, если он уже загружен вместе с записью
+    slug = instance.course.slug if Enrollment.course.is_cached(instance) else None
+    purge_course_pages(instance.course_id, slug)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_pages_changed(sender, instance, **kwargs):
+    if instance.role == 'TEACHER':
+        purge_tags('students', 'instructors')
+    else:
+        purge_tags('students')
+
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_delete, sender=Instructor)
+def instructor_pages_changed(sender, instance, **kwargs):
+    purge_tags('instructors', 'courses')
+
+
+@receiver(post_save, sender=User)
+def user_pages_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Новый пользователь еще без профиля; вход меняет только last_login
+    if created or (update_fields is not None and not {'first_name', 'last_name', 'username'} & set(update_fields)):
+        return
+    role = Profile.objects.filter(user=instance).values_list('role', flat=True).first()
+    if role == 'TEACHER':
+        # Имя преподавателя показано и в карточках его курсов
+        purge_tags('students', 'instructors', 'courses')
+    elif role is not None:
+        # Страницы курсов показывают имена записанных студентов
+        slugs = Course.objects.filter(
+            enrollments__student__user=instance, enrollments__status='ACTIVE'
+        ).values_list('slug', flat=True)
+        purge_tags('students', *(f'course:{slug}' for slug in slugs))
@@ -0,0 +1,192 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(values):
+    """Упаковать значения ключей сортировки в непрозрачную строку для URL"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404('Некорректный курсор страницы')
+    if not isinstance(values, list) or len(values) != size:
+        raise Http404('Некорректный курсор страницы')
+    return values
+
+
+def key_field(model, key):
+    """Поле модели для ключа сортировки, например 'user__last_name'"""
+    opts = model._meta
+    *path, name = key.split('__')
+    for part in path:
+        opts = opts.get_field(part).related_model._meta
+    return opts.pk if name == 'pk' else opts.get_field(name)
+
+
+def clean_cursor_values(model, keys, values):
+    """
+    Привести значения из курсора к типам полей ключей. Курсор приходит из
+    URL, поэтому значение неверного типа ("x" для pk, null, число вне
+    диапазона столбца) дает 404, а не ошибку в .filter() или в БД.
+    """
+    cleaned = []
+    for key, value in zip(keys, values):
+        field = key_field(model, key)
+        try:
+            # Сравнение с NULL в keyset_filter ничего не находит
+            if value is None:
+                raise ValidationError('Пустое значение ключа')
+            value = field.to_python(value)
+            field.run_validators(value)
+            cleaned.append(field.get_prep_value(value))
+        except (ValueError, TypeError, ValidationError):
+            raise Http404('Некорректный курсор страницы')
+    return cleaned
+
+
+def key_values(obj, keys):
+    """Значения ключей сортировки объекта, например 'user__last_name'"""
+    values = []
+    for key in keys:
+        value = obj
+        for attr in key.split('__'):
+            value = getattr(value, attr)
+        values.append(value)
+    return values
+
+
+def keyset_filter(keys, values, forward=True):
+    """
+    Условие "строго после" (или "строго до") набора значений ключей:
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...
+    """
+    lookup = 'gt' if forward else 'lt'
+    condition = Q()
+    for i, key in enumerate(keys):
+        step = Q(**{f'{key}__{lookup}': values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            step &= Q(**{prev_key: prev_value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    """Страница результатов курсорной (keyset) пагинации"""
+    def __init__(self, items, keys, limit, has_next, has_previous):
+        self.object_list = items
+        self.limit = limit
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(key_values(items[-1], keys)) if items and has_next else None
+        self.previous_cursor = encode_cursor(key_values(items[0], keys)) if items and has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def keyset_query(request, queryset, keys, default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    """
+    Запрос одной страницы: (queryset с limit + 1 строкой, limit, курсор after,
+    курсор before). Лишняя строка показывает, есть ли следующая страница.
+    """
+    limit = parse_limit(request.GET.get('limit'), default_limit, max_limit)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+
+    if before:
+        values = clean_cursor_values(queryset.model, keys, decode_cursor(before, len(keys)))
+        queryset = queryset.filter(keyset_filter(keys, values, forward=False))
+        return queryset.order_by(*[f'-{key}' for key in keys])[:limit + 1], limit, after, before
+
+    if after:
+        values = clean_cursor_values(queryset.model, keys, decode_cursor(after, len(keys)))
+        queryset = queryset.filter(keyset_filter(keys, values))
+    return queryset.order_by(*keys)[:limit + 1], limit, after, before
+
+
+def keyset_page(items, keys, limit, after, before):
+    if before:
+        has_previous = len(items) > limit
+        items = items[:limit][::-1]
+        return KeysetPage(items, keys, limit, has_next=True, has_previous=has_previous)
+    has_next = len(items) > limit
+    return KeysetPage(items[:limit], keys, limit, has_next=has_next, has_previous=bool(after))
+
+
+def keyset_paginate(request, queryset, keys):
+    """
+    Разбить queryset на страницы по уникальному набору ключей сортировки.
+
+    Параметры запроса: ?after=<курсор> — следующая страница,
+    ?before=<курсор> — предыдущая, ?limit= — размер страницы.
+    Стоимость любой страницы одинакова, так как OFFSET не используется.
+    """
+    page_queryset, limit, after, before = keyset_query(request, queryset, keys)
+    return keyset_page(list(page_queryset), keys, limit, after, before)
+
+
+async def akeyset_paginate(request, queryset, keys):
+    """Асинхронный вариант keyset_paginate для async-представлений"""
+    page_queryset, limit, after, before = keyset_query(request, queryset, keys)
+    return keyset_page([obj async for obj in page_queryset], keys, limit, after, before)
+
+
+def estimated_count(queryset):
+    """
+    Число строк таблицы по статистике PostgreSQL (pg_class.reltuples)
+    без COUNT(*). None — для запросов с фильтрами, других СУБД и таблиц,
+    по которым еще не собиралась статистика.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для таблиц в миллионы строк (списки в админке): общее число
+    строк без фильтров берется из статистики, а не из COUNT(*) по всей
+    таблице. Для небольших таблиц и списков с фильтрами считается точно.
+    """
+    exact_count_limit = 100000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list) if isinstance(self.object_list, QuerySet) else None
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
@@ -0,0 +1,71 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PRIMARY_COOKIE = 'fefu_primary'
+
+_use_primary = ContextVar('fefu_lab_use_primary', default=False)
+
+
+@contextmanager
+def use_primary():
+    """
+    Читать с основной БД внутри блока: после записи реплика может
+    еще не получить изменения. Переменная контекста видна и в потоках
+    sync_to_async, поэтому работает под ASGI.
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def needs_primary(request):
+    """Запрос изменяет данные или пришел в течение REPLICA_STICKY_SECONDS после записи"""
+    return request.method not in ('GET', 'HEAD', 'OPTIONS') or PRIMARY_COOKIE in request.COOKIES
+
+
+def mark_sticky(request, response):
+    """После запроса с записью следующие запросы клиента читают с основной БД"""
+    if settings.DATABASE_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        response.set_cookie(
+            PRIMARY_COOKIE, '1',
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+    return response
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись — в default, чтение — на случайную реплику из DATABASE_REPLICAS.
+    Чтение остается на default внутри транзакции и в блоке use_primary().
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит с основной БД через репликацию
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
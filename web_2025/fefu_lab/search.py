@@ -0,0 +1,183 @@
+import re
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections, router
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+
+SEARCH_CONFIG = 'russian'
+
+# Название важнее описания: вес A против B в ранжировании
+COURSE_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+)
+COURSE_SEARCH_FIELDS = ('title', 'description')
+
+# Запасной поиск без PostgreSQL: доля триграмм запроса, найденных в тексте
+TRIGRAM_THRESHOLD = 0.5
+DESCRIPTION_WEIGHT = 0.4
+
+
+def uses_full_text(model, write=False):
+    """Полнотекстовый индекс есть только в PostgreSQL"""
+    alias = router.db_for_write(model) if write else router.db_for_read(model)
+    return connections[alias].vendor == 'postgresql'
+
+
+def refresh_search_vectors(queryset):
+    """
+    Пересчитать Course.search_vector для queryset. Нужен после
+    bulk_create и update(), которые обходят сигнал post_save.
+    """
+    if uses_full_text(queryset.model, write=True):
+        queryset.update(search_vector=COURSE_SEARCH_VECTOR)
+
+
+def course_search_query(text):
+    """Запрос в синтаксисе поисковиков: слова, "фраза", -исключение"""
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_courses(text, queryset):
+    """
+    Курсы из queryset, подходящие под запрос, от наиболее релевантных.
+    В PostgreSQL — по GIN-индексу search_vector с морфологией русского
+    языка, иначе — триграммным сравнением в памяти (для локальной разработки).
+    """
+    if not uses_full_text(queryset.model):
+        return trigram_search(text, queryset)
+    return ranked_courses(queryset, course_search_query(text))
+
+
+def autocomplete_courses(text, queryset):
+    """
+    Курсы для подсказок при наборе: каждое слово запроса может быть
+    началом слова (python -> 'python':*), поэтому 'прог' находит
+    «Программирование». Без PostgreSQL — как search_courses.
+    """
+    if not uses_full_text(queryset.model):
+        return trigram_search(text, queryset)
+    words = re.findall(r'\w+', text)
+    if not words:
+        return queryset.none()
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
+    return ranked_courses(queryset, query)
+
+
+def ranked_courses(queryset, query):
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', 'title', 'pk')
+    )
+
+
+def trigrams(text):
+    """Триграммы слов текста, как в pg_trgm: '  слово ' -> '  с', ' сл', ..."""
+    result = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def trigram_search(text, queryset):
+    query = trigrams(text)
+    if not query:
+        return []
+
+    ranks = {}
+    for pk, title, description in queryset.values_list('pk', *COURSE_SEARCH_FIELDS):
+        title_score = len(query & trigrams(title)) / len(query)
+        description_score = len(query & trigrams(description)) / len(query)
+        if max(title_score, description_score) >= TRIGRAM_THRESHOLD:
+            ranks[pk] = title_score + DESCRIPTION_WEIGHT * description_score
+
+    courses = list(queryset.filter(pk__in=ranks))
+    for course in courses:
+        course.rank = ranks[course.pk]
+    return sorted(courses, key=lambda course: (-course.rank, course.title, course.pk))
+
+
+def normalize_search_text(text):
+    """Нижний регистр, е вместо ё, одиночные пробелы"""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def people_search_name(user, student_id=None):
+    """Значение Profile.search_name: ФИО, email и номер студенческого"""
+    parts = [user.last_name, user.first_name, user.email, student_id]
+    return normalize_search_text(' '.join(part for part in parts if part))
+
+
+def refresh_search_names(queryset, batch_size=2000):
+    """Пересчитать Profile.search_name (после bulk_create, которое обходит save)"""
+    batch = []
+    profiles = (
+        queryset.select_related('user')
+        .only('student_id', 'user__first_name', 'user__last_name', 'user__email')
+        .order_by('pk')
+    )
+    for profile in profiles.iterator(chunk_size=batch_size):
+        profile.search_name = people_search_name(profile.user, profile.student_id)
+        batch.append(profile)
+        if len(batch) == batch_size:
+            queryset.model.objects.bulk_update(batch, ['search_name'])
+            batch = []
+    if batch:
+        queryset.model.objects.bulk_update(batch, ['search_name'])
+
+
+@lru_cache
+def has_trigram_extension(alias):
+    """Установлено ли расширение pg_trgm (создает миграция 0008, если оно доступно)"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def search_people(text, queryset, field='search_name'):
+    """
+    Профили (или связанные с ними объекты, field='profile__search_name'),
+    похожие на запрос. С pg_trgm поиск по GIN-индексу триграмм и прощает
+    опечатки, результаты отсортированы по сходству; без него все слова
+    запроса должны входить в search_name.
+    """
+    text = normalize_search_text(text)
+    if not text:
+        return queryset.none()
+    if has_trigram_extension(queryset.db):
+        return (
+            queryset.filter(**{f'{field}__trigram_word_similar': text})
+            .annotate(similarity=TrigramWordSimilarity(text, field))
+            .order_by('-similarity', 'pk')
+        )
+    for word in text.split():
+        queryset = queryset.filter(**{f'{field}__contains': word})
+    return queryset.order_by(field, 'pk')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Новый пользователь еще без профиля; вход меняет только last_login
+    if created or (update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields)):
+        return
+    Profile = apps.get_model('fefu_lab', 'Profile')
+    for pk, student_id in Profile.objects.filter(user=instance).values_list('pk', 'student_id'):
+        Profile.objects.filter(pk=pk).update(search_name=people_search_name(instance, student_id))
+
+
+@receiver(post_save, sender='fefu_lab.Course')
+def course_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(COURSE_SEARCH_FIELDS) & set(update_fields):
+        return
+    refresh_search_vectors(sender.objects.filter(pk=instance.pk))
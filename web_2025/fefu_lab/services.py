@@ -0,0 +1,41 @@
+from django.db import IntegrityError, transaction
+from .models import Course, Enrollment
+
+
+# Результаты записи на курс
+ENROLL_OK = 'OK'
+ENROLL_ALREADY = 'ALREADY_ENROLLED'
+ENROLL_FULL = 'FULL'
+ENROLL_CLOSED = 'CLOSED'
+
+
+def enroll_student(student, course):
+    """
+    Записать студента на курс, зарезервировав место в одной транзакции.
+
+    Строка курса блокируется через SELECT ... FOR UPDATE, поэтому
+    параллельные записи на один курс выполняются по очереди и не могут
+    превысить max_students. Возвращает кортеж (результат, запись).
+    """
+    try:
+        with transaction.atomic():
+            course = Course.objects.select_for_update().get(pk=course.pk)
+
+            enrollment = Enrollment.objects.filter(student=student, course=course).first()
+            if enrollment is not None and enrollment.status != 'CANCELLED':
+                return ENROLL_ALREADY, enrollment
+
+            if not course.is_active:
+                return ENROLL_CLOSED, None
+            if course.enrolled_students_count >= course.max_students:
+                return ENROLL_FULL, None
+
+            # Отмененную запись восстанавливаем, чтобы не нарушить unique_together
+            if enrollment is None:
+                enrollment = Enrollment(student=student, course=course)
+            enrollment.status = 'ACTIVE'
+            enrollment.save()
+    except IntegrityError:
+        return ENROLL_ALREADY, None
+
+    return ENROLL_OK, enrollment
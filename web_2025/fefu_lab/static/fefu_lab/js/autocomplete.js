@@ -0,0 +1,54 @@
+// Подсказки для AutocompleteSelect (fefu_lab/forms.py): строка ввода
+// запрашивает JSON по data-autocomplete-url, выбор записывает pk в скрытое поле
+document.querySelectorAll('.autocomplete').forEach(function (box) {
+    var hidden = box.querySelector('input[type=hidden]');
+    var input = box.querySelector('input[type=search]');
+    var list = box.querySelector('.autocomplete-results');
+    var timer = null;
+    var controller = null;
+
+    function close() {
+        list.hidden = true;
+        list.innerHTML = '';
+    }
+
+    function show(results) {
+        list.innerHTML = '';
+        results.forEach(function (item) {
+            var option = document.createElement('li');
+            option.setAttribute('role', 'option');
+            option.textContent = item.label;
+            // mousedown срабатывает раньше blur строки ввода
+            option.addEventListener('mousedown', function (event) {
+                event.preventDefault();
+                hidden.value = item.id;
+                input.value = item.title;
+                close();
+            });
+            list.appendChild(option);
+        });
+        list.hidden = results.length === 0;
+    }
+
+    input.addEventListener('input', function () {
+        hidden.value = '';
+        clearTimeout(timer);
+        var query = input.value.trim();
+        if (query.length < 2) {
+            close();
+            return;
+        }
+        // Запрос после паузы в наборе; предыдущий незавершенный отменяется
+        timer = setTimeout(function () {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(box.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query), {signal: controller.signal})
+                .then(function (response) { return response.json(); })
+                .then(function (data) { show(data.results); })
+                .catch(function () {});
+        }, 200);
+    });
+    input.addEventListener('blur', close);
+});
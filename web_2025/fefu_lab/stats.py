@@ -0,0 +1,115 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Profile, Course, Enrollment
+from .routers import use_primary
+
+
+STATS_CACHE_KEY = 'fefu_lab:site_stats'
+STATS_LOCK_KEY = 'fefu_lab:site_stats:lock'
+
+# Через STATS_TTL значение считается устаревшим, но еще STATS_GRACE секунд
+# отдается остальным воркерам, пока один из них пересчитывает статистику
+STATS_TTL = 300
+STATS_GRACE = 60
+STATS_LOCK_TIMEOUT = 10
+STATS_WAIT_ATTEMPTS = 20
+STATS_WAIT_INTERVAL = 0.05
+
+
+def compute_site_stats():
+    """Посчитать статистику сайта: три агрегата и последние курсы"""
+    profiles = Profile.objects.aggregate(
+        total_students=Count('pk', filter=Q(role='STUDENT')),
+        active_students=Count('pk', filter=Q(role='STUDENT', is_active=True)),
+        total_teachers=Count('pk', filter=Q(role='TEACHER')),
+    )
+    courses = Course.objects.aggregate(
+        total_courses=Count('pk'),
+        active_courses=Count('pk', filter=Q(is_active=True)),
+    )
+    return {
+        **profiles,
+        **courses,
+        'total_enrollments': Enrollment.objects.count(),
+        'recent_courses': list(Course.objects.filter(is_active=True).order_by('-created_at')[:3]),
+    }
+
+
+def refresh_site_stats():
+    # Значение живет в кэше минуты, поэтому считаем его по основной БД,
+    # а не по реплике, которая могла отстать
+    with use_primary():
+        stats = compute_site_stats()
+    cache.set(STATS_CACHE_KEY, {'stats': stats, 'fresh_until': time.time() + STATS_TTL}, STATS_TTL + STATS_GRACE)
+    return stats
+
+
+def get_site_stats():
+    """
+    Статистика сайта из кэша.
+
+    При промахе пересчет выполняет только воркер, захвативший блокировку
+    через cache.add(); остальные отдают устаревшее значение или ждут,
+    пока новое появится в кэше, вместо одновременных запросов к БД.
+    Блокировка надежна, только если add() атомарен между процессами
+    (Redis, LocMemCache в одном процессе); с FileBasedCache при
+    одновременном промахе пересчитать могут несколько воркеров.
+    """
+    entry = cache.get(STATS_CACHE_KEY)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry['stats']
+
+    if cache.add(STATS_LOCK_KEY, 1, STATS_LOCK_TIMEOUT):
+        try:
+            return refresh_site_stats()
+        finally:
+            cache.delete(STATS_LOCK_KEY)
+
+    if entry is not None:
+        return entry['stats']
+
+    for _ in range(STATS_WAIT_ATTEMPTS):
+        time.sleep(STATS_WAIT_INTERVAL)
+        entry = cache.get(STATS_CACHE_KEY)
+        if entry is not None:
+            return entry['stats']
+
+    # Не дождались другого воркера — считаем сами
+    with use_primary():
+        return compute_site_stats()
+
+
+async def aget_site_stats():
+    """get_site_stats для async-представлений: свежее значение читается без потока"""
+    entry = await cache.aget(STATS_CACHE_KEY)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry['stats']
+    return await sync_to_async(get_site_stats)()
+
+
+def invalidate_site_stats():
+    # Сбрасываем после коммита, иначе другой воркер может закэшировать данные до изменения
+    transaction.on_commit(lambda: cache.delete(STATS_CACHE_KEY))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Enrollment)
+def site_stats_changed(sender, **kwargs):
+    invalidate_site_stats()
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, created, **kwargs):
+    # Смена статуса записи на статистику не влияет
+    if created:
+        invalidate_site_stats()
@@ -0,0 +1,51 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # .br создаются, только если установлен пакет brotli
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хэшем содержимого в имени (style.3f2a9c1b7d4e.css) и
+    заранее сжатыми копиями .gz/.br рядом с файлами, которые nginx
+    отдает через gzip_static/brotli_static без сжатия на лету.
+    """
+    compress_extensions = ('.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico')
+
+    def stored_name(self, name):
+        # Без манифеста (тесты, collectstatic еще не запускался) отдаем исходное
+        # имя; nginx кэширует надолго только имена с хэшем
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if hashed_name and not isinstance(processed, Exception):
+                processed_names.update((name, hashed_name))
+
+        if dry_run:
+            return
+        for name in sorted(processed_names):
+            if name.endswith(self.compress_extensions):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            # Сжатая копия, не меньшая оригинала, только замедлила бы отдачу
+            if len(compressed) >= len(content):
+                continue
+            with open(self.path(name + suffix), 'wb') as target:
+                target.write(compressed)
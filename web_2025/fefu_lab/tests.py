@@ -1,3 +1,1443 @@
-from django.test import TestCase
+import copy
+import gzip
+import json
+import os
+import runpy
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from PIL import Image
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from web_2025 import settings as project_settings
+
+from .avatars import MAX_DIMENSION, THUMB_SIZES, thumb_name, thumbnails_ready
+from .backends import EmailBackend
+from .decorators import student_required, teacher_required
+from .exports import csv_cell
+from .middleware import ReplicaRoutingMiddleware
+from .page_cache import cache_anonymous_page
+from .models import Profile, Instructor, Course, Enrollment
+from .pagination import EstimatedCountPaginator, encode_cursor
+from .routers import PRIMARY_COOKIE, PrimaryReplicaRouter, use_primary
+from .search import has_trigram_extension, search_courses, search_people
+from .stats import get_site_stats
+from .services import enroll_student, ENROLL_OK, ENROLL_ALREADY, ENROLL_FULL, ENROLL_CLOSED
+
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'templates': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'templates'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'},
+}
+
+
+def create_students(count, prefix='student'):
+    """Быстро создать count студентов с профилями"""
+    users = User.objects.bulk_create([
+        User(username=f'{prefix}{i}', email=f'{prefix}{i}@fefu.ru', first_name='Имя', last_name=f'Фамилия{i}')
+        for i in range(count)
+    ])
+    if not connection.features.can_return_rows_from_bulk_insert:
+        users = list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+    Profile.objects.bulk_create([
+        Profile(user=user, role='STUDENT', student_id=f'{prefix}-{user.pk}')
+        for user in users
+    ])
+    return list(Profile.objects.filter(user__username__startswith=prefix).order_by('pk'))
+
+
+class EnrollStudentTests(TestCase):
+    def setUp(self):
+        self.students = create_students(3)
+        self.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36, max_students=2
+        )
+
+    def test_enroll_ok_and_already_enrolled(self):
+        result, enrollment = enroll_student(self.students[0], self.course)
+        self.assertEqual(result, ENROLL_OK)
+        self.assertEqual(enrollment.status, 'ACTIVE')
+
+        result, _ = enroll_student(self.students[0], self.course)
+        self.assertEqual(result, ENROLL_ALREADY)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_students_count, 1)
+
+    def test_full_course(self):
+        enroll_student(self.students[0], self.course)
+        enroll_student(self.students[1], self.course)
+
+        result, enrollment = enroll_student(self.students[2], self.course)
+        self.assertEqual(result, ENROLL_FULL)
+        self.assertIsNone(enrollment)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 2)
+
+    def test_cancelled_enrollment_is_restored(self):
+        _, enrollment = enroll_student(self.students[0], self.course)
+        enrollment.status = 'CANCELLED'
+        enrollment.save()
+
+        result, restored = enroll_student(self.students[0], self.course)
+        self.assertEqual(result, ENROLL_OK)
+        self.assertEqual(restored.pk, enrollment.pk)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_students_count, 1)
+
+    def test_counter_with_deferred_status(self):
+        enroll_student(self.students[0], self.course)
+
+        # Загрузка без status: сохранение оценки не меняет счетчик
+        enrollment = Enrollment.objects.only('grade').get(course=self.course)
+        enrollment.grade = '5'
+        enrollment.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_students_count, 1)
+
+        # Статус не записывается — счетчик не трогаем
+        enrollment.status = 'CANCELLED'
+        enrollment.save(update_fields=['grade'])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_students_count, 1)
+
+        enrollment = Enrollment.objects.defer('status').get(course=self.course)
+        enrollment.status = 'CANCELLED'
+        enrollment.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_students_count, 0)
+
+    def test_inactive_course(self):
+        self.course.is_active = False
+        self.course.save()
+        result, _ = enroll_student(self.students[0], self.course)
+        self.assertEqual(result, ENROLL_CLOSED)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class EnrollStudentConcurrencyTests(TransactionTestCase):
+    # Вне транзакции чтение может уйти на реплику, если она настроена
+    databases = {'default', *settings.DATABASE_REPLICAS}
+    STUDENTS = 1000
+    WORKERS = 16
+
+    def test_parallel_enrollments_never_exceed_capacity(self):
+        students = create_students(self.STUDENTS)
+        course = Course.objects.create(
+            title='Популярный курс', slug='popular', description='...', duration=10, max_students=5
+        )
+
+        def attempt(student):
+            try:
+                return enroll_student(student, course)[0]
+            finally:
+                connection.close()
+
+        # Каждый студент пытается записаться дважды
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            results = list(pool.map(attempt, students * 2))
+
+        course.refresh_from_db()
+        active = Enrollment.objects.filter(course=course, status='ACTIVE').count()
+        self.assertEqual(results.count(ENROLL_OK), course.max_students)
+        self.assertEqual(active, course.max_students)
+        self.assertEqual(course.enrolled_students_count, course.max_students)
+        self.assertEqual(results.count(ENROLL_FULL) + results.count(ENROLL_ALREADY), 2 * self.STUDENTS - 5)
+
+    def test_parallel_cancellations_shift_once(self):
+        students = create_students(2)
+        course = Course.objects.create(title='Курс', slug='course', description='...', duration=10)
+        for student in students:
+            enroll_student(student, course)
+        # Каждый поток загрузил запись активной и отменяет ее
+        copies = [Enrollment.objects.get(student=students[0], course=course) for _ in range(self.WORKERS)]
+
+        def cancel(enrollment):
+            try:
+                enrollment.status = 'CANCELLED'
+                enrollment.save()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(cancel, copies))
+
+        course.refresh_from_db()
+        self.assertEqual(course.enrolled_students_count, 1)
+
+
+class TeacherDashboardQueryTests(TestCase):
+    MAX_QUERIES = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user('teacher1', 'teacher1@fefu.ru', 'password123')
+        profile = Profile.objects.create(user=self.user, role='TEACHER', specialization='Кибербезопасность')
+        self.instructor = Instructor.objects.create(profile=profile)
+        self.client.force_login(self.user)
+
+    def add_courses(self, count, students_per_course, prefix):
+        students = create_students(students_per_course, prefix=prefix)
+        for i in range(count):
+            course = Course.objects.create(
+                title=f'{prefix} курс {i}', slug=f'{prefix}-{i}', description='...',
+                duration=10, instructor=self.instructor
+            )
+            Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('profile'))
+        self.assertTemplateUsed(response, 'fefu_lab/dashboard/teacher_dashboard.html')
+        return len(ctx)
+
+    def test_query_count_does_not_grow(self):
+        self.add_courses(2, 2, prefix='small')
+        small = self.dashboard_queries()
+
+        self.add_courses(10, 15, prefix='large')
+        large = self.dashboard_queries()
+
+        self.assertLessEqual(small, self.MAX_QUERIES)
+        self.assertEqual(small, large)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryCountRegressionTests(TestCase):
+    """
+    Число SQL-запросов каждой страницы не должно зависеть от объема данных.
+
+    Данные наращиваются до SIZES студентов и курсов, после каждого шага
+    все страницы запрашиваются заново. Рост числа запросов означает N+1.
+    """
+    SIZES = [10, 100, 1000]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student_user = User.objects.create_user('main_student', 'main_student@fefu.ru', 'password123')
+        cls.student = Profile.objects.create(user=cls.student_user, role='STUDENT', student_id='MAIN-1')
+
+        cls.teacher_user = User.objects.create_user('main_teacher', 'main_teacher@fefu.ru', 'password123')
+        teacher_profile = Profile.objects.create(user=cls.teacher_user, role='TEACHER')
+        cls.instructor = Instructor.objects.create(profile=teacher_profile)
+
+        cls.admin_user = User.objects.create_superuser('main_admin', 'main_admin@fefu.ru', 'password123')
+        Profile.objects.create(user=cls.admin_user, role='ADMIN', admin_level='SUPER_ADMIN')
+
+        cls.course = Course.objects.create(
+            title='Основной курс', slug='main-course', description='...', duration=10, instructor=cls.instructor
+        )
+
+    def grow_dataset(self, size):
+        """Дополнить данные до size студентов и курсов"""
+        students = create_students(size - self.seeded, prefix=f'seed{size}-')
+
+        teachers = [self.instructor]
+        for i in range(size // 10):
+            user = User.objects.create(username=f'teacher{size}-{i}', first_name='Препод', last_name=f'{size}-{i}')
+            teachers.append(Instructor.objects.create(profile=Profile.objects.create(user=user, role='TEACHER')))
+
+        Course.objects.bulk_create([
+            Course(
+                title=f'Курс {size}-{i}', slug=f'course-{size}-{i}', description='...', duration=10,
+                instructor=self.instructor if i % 2 == 0 else teachers[i % len(teachers)]
+            )
+            for i in range(size - self.seeded)
+        ])
+        courses = Course.objects.filter(slug__startswith=f'course-{size}-')
+
+        Enrollment.objects.bulk_create(
+            [Enrollment(student=self.student, course=course) for course in courses] +
+            [Enrollment(student=student, course=self.course) for student in students]
+        )
+        self.seeded = size
+
+    def pages(self):
+        return [
+            ('home', reverse('home'), None),
+            ('about', reverse('about'), None),
+            ('student_list', reverse('student_list'), None),
+            ('student_detail', reverse('student_detail', kwargs={'pk': self.student.pk}), None),
+            ('course_list', reverse('course_list'), None),
+            ('course_detail', reverse('course_detail', kwargs={'slug': self.course.slug}), None),
+            ('feedback', reverse('feedback'), None),
+            ('login', reverse('login'), None),
+            ('register', reverse('register'), None),
+            ('enrollment', reverse('enrollment'), self.student_user),
+            ('profile_student', reverse('profile'), self.student_user),
+            ('profile_teacher', reverse('profile'), self.teacher_user),
+            ('profile_admin', reverse('profile'), self.admin_user),
+            ('profile_edit', reverse('profile_edit'), self.student_user),
+            ('admin_users', reverse('admin:auth_user_changelist'), self.admin_user),
+            ('admin_profiles', reverse('admin:fefu_lab_profile_changelist'), self.admin_user),
+            ('admin_instructors', reverse('admin:fefu_lab_instructor_changelist'), self.admin_user),
+            ('admin_courses', reverse('admin:fefu_lab_course_changelist'), self.admin_user),
+            ('admin_enrollments', reverse('admin:fefu_lab_enrollment_changelist'), self.admin_user),
+        ]
+
+    def count_queries(self, url, user):
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+
+        # Меряем холодный путь: кэш не должен скрывать N+1
+        cache.clear()
+        caches['templates'].clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.seeded = 0
+        counts = {}
+        for size in self.SIZES:
+            self.grow_dataset(size)
+            for name, url, user in self.pages():
+                counts.setdefault(name, []).append(self.count_queries(url, user))
+
+        for name, values in counts.items():
+            with self.subTest(page=name, queries=values):
+                self.assertEqual(len(set(values)), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Course.objects.create(title=f'Курс {i}', slug=f'course-{i}', description='...', duration=10)
+        # Одинаковое название: порядок определяется вторым ключом (pk)
+        Course.objects.create(title='Курс 2', slug='course-2-bis', description='...', duration=10)
+
+    def test_walk_forward_and_back(self):
+        slugs = []
+        url = reverse('course_list') + '?limit=2'
+        pages = []
+        while url:
+            page = self.client.get(url).context['page']
+            pages.append(page)
+            slugs += [course.slug for course in page]
+            url = f"{reverse('course_list')}?after={page.next_cursor}&limit=2" if page.has_next else None
+
+        expected = list(Course.objects.order_by('title', 'pk').values_list('slug', flat=True))
+        self.assertEqual(slugs, expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = self.client.get(f"{reverse('course_list')}?before={pages[-1].previous_cursor}&limit=2")
+        self.assertEqual([c.slug for c in previous.context['page']], expected[2:4])
+        self.assertTrue(previous.context['page'].has_previous)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('course_list') + '?after=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_types(self):
+        # Правильно закодированные курсоры со значениями не того типа
+        cases = [
+            ('course_list', ['Курс', 'x']),
+            ('course_list', [None, 1]),
+            ('course_list', ['Курс', 10 ** 30]),
+            ('course_list', ['Курс', [1]]),
+            ('student_list', ['Фамилия', 'Имя', 'x']),
+            ('api_course_list', ['x']),
+        ]
+        for url_name, values in cases:
+            for direction in ('after', 'before'):
+                with self.subTest(url_name=url_name, values=values, direction=direction):
+                    response = self.client.get(reverse(url_name), {direction: encode_cursor(values)})
+                    self.assertEqual(response.status_code, 404)
+
+
+class IndexUsageTests(TestCase):
+    """Основные запросы страниц должны использовать индексы, а не полный просмотр таблицы"""
+    STUDENTS = 2000
+    COURSES = 500
+    COURSES_PER_STUDENT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='teacher_explain', last_name='Петров')
+        cls.instructor = Instructor.objects.create(profile=Profile.objects.create(user=user, role='TEACHER'))
+        students = create_students(cls.STUDENTS, prefix='explain')
+        Course.objects.bulk_create([
+            Course(
+                title=f'Курс {i:04d}', slug=f'explain-{i}', description='...', duration=10,
+                is_active=i % 10 != 0, instructor=cls.instructor if i % 50 == 0 else None
+            )
+            for i in range(cls.COURSES)
+        ])
+        courses = list(Course.objects.order_by('pk'))
+        statuses = ['ACTIVE', 'ACTIVE', 'COMPLETED', 'CANCELLED']
+        Enrollment.objects.bulk_create([
+            Enrollment(
+                student=student,
+                course=courses[(n * 7 + k * 31) % len(courses)],
+                status=statuses[(n + k) % len(statuses)]
+            )
+            for n, student in enumerate(students)
+            for k in range(cls.COURSES_PER_STUDENT)
+        ])
+        cls.student = students[0]
+        cls.course = courses[1]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, table):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertIn('Index', plan, plan)
+            self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+        else:
+            lines = [line for line in plan.splitlines() if f' {table} ' in f'{line} ']
+            self.assertTrue(lines, plan)
+            for line in lines:
+                self.assertIn('INDEX', line, plan)
+
+    def test_home_recent_courses(self):
+        self.assertUsesIndex(Course.objects.filter(is_active=True).order_by('-created_at')[:3], 'courses')
+
+    def test_course_list(self):
+        self.assertUsesIndex(Course.objects.filter(is_active=True).order_by('title', 'pk')[:21], 'courses')
+
+    def test_course_detail_enrollments(self):
+        self.assertUsesIndex(self.course.enrollments.filter(status='ACTIVE'), 'enrollments')
+
+    def test_student_enrollments(self):
+        self.assertUsesIndex(Enrollment.objects.filter(student=self.student, status='ACTIVE'), 'enrollments')
+
+    def test_teacher_courses(self):
+        self.assertUsesIndex(Course.objects.filter(instructor=self.instructor, is_active=True), 'courses')
+
+    def test_teacher_count(self):
+        self.assertUsesIndex(Profile.objects.filter(role='TEACHER', is_active=True).values('pk'), 'profiles')
+
+    def test_login_lookup(self):
+        self.assertUsesIndex(EmailBackend().login_candidates('Explain7@FEFU.ru'), 'auth_user')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SiteStatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_students(3)
+        Course.objects.create(title='Основы Python', slug='python-basics', description='...', duration=36)
+
+    def test_served_from_cache(self):
+        get_site_stats()
+        with self.assertNumQueries(0):
+            stats = get_site_stats()
+        self.assertEqual(stats['active_students'], 3)
+        self.assertEqual(stats['active_courses'], 1)
+
+    def test_invalidated_on_save(self):
+        self.assertEqual(get_site_stats()['active_courses'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title='Веб-безопасность', slug='web-security', description='...', duration=48)
+        self.assertEqual(get_site_stats()['active_courses'], 2)
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_single_recompute_on_concurrent_miss(self):
+        # LocMemCache.add() атомарен (под блокировкой), как add() в Redis
+        cache.clear()
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'active_courses': 1}
+
+        with mock.patch('fefu_lab.stats.compute_site_stats', slow_compute):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: get_site_stats(), range(8)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'active_courses': 1}] * 8)
+
+    def test_redis_cache_from_env(self):
+        with mock.patch.dict(os.environ, {'REDIS_URL': 'redis://localhost:6379/1'}):
+            configured = runpy.run_path(str(settings.BASE_DIR / 'web_2025' / 'settings.py'))
+        self.assertEqual(configured['CACHES']['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(configured['CACHES']['sessions']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36
+        )
+        self.url = reverse('course_detail', kwargs={'slug': self.course.slug})
+
+    def test_anonymous_hit_skips_view(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Основы Python')
+
+    def test_course_save_purges_detail_and_list(self):
+        self.client.get(self.url)
+        self.client.get(reverse('course_list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.title = 'Python для начинающих'
+            self.course.save()
+        self.assertContains(self.client.get(self.url), 'Python для начинающих')
+        self.assertContains(self.client.get(reverse('course_list')), 'Python для начинающих')
+
+    def test_slug_change_purges_old_url(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.slug = 'python-start'
+            self.course.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_cascade_delete_purges_course_pages_once(self):
+        courses = [self.course] + [
+            Course.objects.create(title=f'Курс {i}', slug=f'course-{i}', description='...', duration=10)
+            for i in range(3)
+        ]
+        student = create_students(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            for course in courses:
+                Enrollment.objects.create(student=student, course=course)
+        self.assertContains(self.client.get(self.url), student.full_name)
+
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                student.user.delete()
+        slug_queries = [q for q in ctx.captured_queries if 'slug' in q['sql'] and 'courses' in q['sql']]
+        self.assertEqual(len(slug_queries), 1)
+        self.assertNotContains(self.client.get(self.url), student.full_name)
+
+    def test_authenticated_not_cached(self):
+        user = User.objects.create_user('student1', 'student1@fefu.ru', 'password123')
+        Profile.objects.create(user=user, role='STUDENT')
+        self.client.force_login(user)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertGreater(len(ctx), 0)
+
+
+class CountingPasswordHasher(MD5PasswordHasher):
+    """Хэшер, считающий количество вычислений хэша"""
+    calls = 0
+
+    def encode(self, password, salt):
+        CountingPasswordHasher.calls += 1
+        return super().encode(password, salt)
+
+
+@override_settings(PASSWORD_HASHERS=['fefu_lab.tests.CountingPasswordHasher'])
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('anna', 'Anna@fefu.ru', 'password123', first_name='Анна')
+        Profile.objects.create(user=self.user, role='STUDENT')
+        CountingPasswordHasher.calls = 0
+
+    def login(self, username, password='password123'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password})
+
+    def test_email_login_ignores_case(self):
+        response = self.login('anna@FEFU.RU')
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.pk)
+        self.assertEqual(CountingPasswordHasher.calls, 1)
+
+    def test_username_login(self):
+        response = self.login('anna')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(CountingPasswordHasher.calls, 1)
+
+    def test_wrong_password_hashes_once(self):
+        response = self.login('anna@fefu.ru', 'wrong')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertEqual(CountingPasswordHasher.calls, 1)
+
+    def test_unknown_user_hashes_once(self):
+        # Неизвестный логин стоит столько же, сколько неверный пароль
+        response = self.login('nobody@fefu.ru')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CountingPasswordHasher.calls, 1)
+
+    def test_inactive_user_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('anna').status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_registration_rejects_email_in_other_case(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'anna2', 'email': 'ANNA@fefu.ru', 'first_name': 'Анна', 'last_name': 'Петрова',
+            'password1': 'Slozhnyi-parol-42', 'password2': 'Slozhnyi-parol-42', 'faculty': 'CS', 'year_of_study': 1,
+        })
+        self.assertEqual(list(response.context['form'].errors), ['email'])
+        self.assertFalse(User.objects.filter(username='anna2').exists())
+
+
+class ProfileMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('teacher1', 'teacher1@fefu.ru', 'password123')
+        self.profile = Profile.objects.create(user=self.user, role='TEACHER')
+        Instructor.objects.create(profile=self.profile)
+        self.client.force_login(self.user)
+
+    def test_user_profile_and_instructor_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('profile'))
+        self.assertTemplateUsed(response, 'fefu_lab/dashboard/teacher_dashboard.html')
+        profile_queries = [q['sql'] for q in ctx.captured_queries if 'profiles' in q['sql']]
+        self.assertIn('auth_user', profile_queries[0])
+        self.assertIn('instructors', profile_queries[0])
+        # Курсы преподавателя ищутся по id из уже загруженной записи, без JOIN с профилем
+        self.assertEqual(len(profile_queries), 1, profile_queries)
+
+    def test_role_decorators_do_not_query(self):
+        def view(request):
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/')
+        request.user = EmailBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(teacher_required(view)(request).status_code, 200)
+            self.assertEqual(student_required(view)(request).status_code, 403)
+
+    def test_missing_profile(self):
+        self.profile.delete()
+        response = self.client.get(reverse('enrollment'))
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+
+
+@override_settings(CACHES=TEST_CACHES, USER_CACHE_TIMEOUT=60)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123')
+        self.profile = Profile.objects.create(user=self.user, role='STUDENT')
+        self.client.force_login(self.user)
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('profile'))
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]
+
+    def test_user_served_from_cache(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_profile_save_invalidates(self):
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.role = 'ADMIN'
+            self.profile.save()
+        response = self.client.get(reverse('profile'))
+        self.assertTemplateUsed(response, 'fefu_lab/dashboard/admin_dashboard.html')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123')
+        Profile.objects.create(user=self.user, role='STUDENT')
+
+    def test_authenticated_request_skips_session_table(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('profile'))
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_evicted_session_read_from_db(self):
+        # Кэш сессий ограничен MAX_ENTRIES; вытесненная сессия остается в БД
+        self.client.force_login(self.user)
+        caches['sessions'].clear()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_anonymous_message_does_not_create_session(self):
+        response = self.client.post(reverse('feedback'), {
+            'name': 'Анна', 'email': 'anna@fefu.ru', 'subject': 'Вопрос', 'message': 'Когда начнется курс?',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('messages', response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_cleanup_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+            for i in range(5)
+        ] + [
+            Session(session_key=f'valid{i}', session_data='', expire_date=now + timedelta(days=1))
+            for i in range(2)
+        ])
+        out = StringIO()
+        call_command('cleanup_sessions', batch_size=2, sleep=0, stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), ['valid0', 'valid1'])
+
+
+class SeedDataTests(TestCase):
+    def test_no_clear_appends(self):
+        options = {'students': 3, 'courses': 2, 'enrollments': 4, 'stdout': StringIO()}
+        call_command('seed_data', **options)
+        call_command('seed_data', no_clear=True, seed=7, **options)
+
+        # Демо-аккаунты не дублируются, сгенерированные номера продолжаются
+        self.assertEqual(User.objects.filter(username='teacher1').count(), 1)
+        self.assertTrue(User.objects.filter(username='student6').exists())
+        self.assertTrue(Course.objects.filter(slug='course-4').exists())
+        self.assertEqual(Profile.objects.filter(role='STUDENT').count(), 7)
+        self.assertEqual(Enrollment.objects.count(), 8)
+
+
+def make_image(width, height, image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, image_format)
+    return SimpleUploadedFile(f'photo.{image_format.lower()}', buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(AVATAR_THUMBNAIL_ASYNC=False)
+class AvatarThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123')
+        self.profile = Profile.objects.create(user=self.user, role='STUDENT')
+        self.client.force_login(self.user)
+
+    def upload(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('profile_edit'), {'avatar': image})
+
+    def test_upload_creates_thumbnails(self):
+        response = self.upload(make_image(1200, 800))
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+
+        self.profile.refresh_from_db()
+        name = self.profile.avatar.name
+        self.assertTrue(thumbnails_ready(name))
+        for size in THUMB_SIZES:
+            for extension in ('webp', 'jpg'):
+                with default_storage.open(thumb_name(name, size, extension)) as thumb:
+                    self.assertEqual(Image.open(thumb).size, (size, size))
+
+        page = self.client.get(reverse('profile')).content.decode()
+        self.assertIn(thumb_name(name, THUMB_SIZES[0], 'jpg'), page)
+        self.assertIn('type="image/webp"', page)
+        self.assertNotIn(f'src="{self.profile.avatar.url}"', page)
+
+    def test_original_until_thumbnails_ready(self):
+        self.profile.avatar = 'avatars/missing.png'
+        self.assertEqual(self.profile.avatar_thumb.url, self.profile.avatar.url)
+        self.assertEqual(self.profile.avatar_thumb.webp_srcset, '')
+
+    def test_oversized_image_rejected(self):
+        response = self.upload(make_image(MAX_DIMENSION + 1, 10))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('avatar', response.context['form'].errors)
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.avatar)
+
+    def test_save_with_missing_avatar_file(self):
+        self.upload(make_image(400, 400))
+        self.profile.refresh_from_db()
+        default_storage.delete(self.profile.avatar.name)
+
+        self.profile.bio = 'Новое описание'
+        self.profile.full_clean()
+        self.profile.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.bio, 'Новое описание')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        static = override_settings(STATIC_ROOT=static_root)
+        static.enable()
+        self.addCleanup(static.disable)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        url = staticfiles_storage.url('fefu_lab/css/style.css')
+        self.assertRegex(url, r'/fefu_lab/css/style\.[0-9a-f]{12}\.css$')
+
+        hashed_name = staticfiles_storage.stored_name('fefu_lab/css/style.css')
+        with staticfiles_storage.open(hashed_name) as original, staticfiles_storage.open(hashed_name + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), original.read())
+
+        self.assertContains(self.client.get(reverse('about')), url)
+
+    def test_without_manifest_uses_plain_name(self):
+        self.assertEqual(staticfiles_storage.url('fefu_lab/css/style.css'), '/static/fefu_lab/css/style.css')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36
+        )
+        self.url = reverse('course_detail', kwargs={'slug': self.course.slug})
+
+    def test_not_modified_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_course_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.description = 'Новое описание'
+            self.course.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_student_rename_changes_course_etag(self):
+        user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123', first_name='Анна', last_name='Иванова')
+        Enrollment.objects.create(student=Profile.objects.create(user=user, role='STUDENT'), course=self.course)
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_name = 'Смирнова'
+            user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Анна Смирнова')
+
+    def test_etag_differs_per_user(self):
+        anonymous = self.client.get(self.url)['ETag']
+        user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123')
+        Profile.objects.create(user=user, role='STUDENT')
+        self.client.force_login(user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip(self):
+        response = self.client.get(reverse('course_list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Основы Python', gzip.decompress(response.content).decode())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsyncViewTests(TestCase):
+    """Страницы для чтения под ASGI: без синхронных обращений к БД из цикла событий"""
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('teacher1', 'teacher1@fefu.ru', 'password123', first_name='Иван')
+        instructor = Instructor.objects.create(profile=Profile.objects.create(user=user, role='TEACHER'))
+        cls.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36, instructor=instructor
+        )
+        student = create_students(1)[0]
+        cls.student_name = student.full_name
+        Enrollment.objects.create(student=student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+        self.async_client = AsyncClient()
+
+    async def test_pages_anonymous(self):
+        for url in [reverse('home'), reverse('course_list'), reverse('student_list'),
+                    reverse('course_detail', kwargs={'slug': self.course.slug})]:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.student_name)
+
+    async def test_pages_authenticated(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='teacher1'))
+        response = await self.async_client.get(reverse('course_detail', kwargs={'slug': self.course.slug}))
+        self.assertContains(response, 'Основы Python')
+        # Меню преподавателя строится из профиля, загруженного вместе с пользователем
+        self.assertContains(response, 'Дашборд преподавателя')
+
+    async def test_missing_course(self):
+        response = await self.async_client.get(reverse('course_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_views_only_under_asgi(self):
+        # Под WSGI — синхронные представления без async_to_sync, под ASGI — async-варианты
+        url = reverse('course_detail', kwargs={'slug': self.course.slug})
+        response = await self.async_client.get(url)
+        self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+        self.assertEqual(response.resolver_match.url_name, 'course_detail')
+
+        response = await sync_to_async(self.client.get)(url)
+        self.assertContains(response, self.student_name)
+        self.assertFalse(iscoroutinefunction(response.resolver_match.func))
+
+
+class ConnectionPoolSettingsTests(SimpleTestCase):
+    def test_pool_replaces_persistent_connections(self):
+        database = project_settings.DATABASES['default']
+        self.assertIn('pool', database['OPTIONS'])
+        self.assertEqual(database.get('CONN_MAX_AGE', 0), 0)
+
+    def test_pool_size_matches_gunicorn(self):
+        gunicorn = runpy.run_path(str(settings.BASE_DIR / 'deploy' / 'gunicorn' / 'config.py'))
+        # Каждому потоку воркера — свое соединение
+        self.assertGreaterEqual(project_settings.DB_POOL_MAX_SIZE, gunicorn['threads'])
+        self.assertLessEqual(project_settings.DB_POOL_MIN_SIZE, project_settings.DB_POOL_MAX_SIZE)
+        # Запас до max_connections PostgreSQL (100) для manage.py и суперпользователя
+        self.assertLess(gunicorn['workers'] * project_settings.DB_POOL_MAX_SIZE, 90)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Пул соединений есть только у PostgreSQL')
+class ConnectionPoolTests(TestCase):
+    def pooled_connection(self):
+        """connections['default'] с пулом из settings проекта (тестовые настройки могут его заменять)"""
+        default = connections['default']
+        if default.pool is not None:
+            return default, False
+        project_database = project_settings.DATABASES['default']
+        settings_dict = copy.deepcopy(default.settings_dict)
+        settings_dict['OPTIONS'] = {**settings_dict['OPTIONS'], 'pool': project_database['OPTIONS']['pool']}
+        settings_dict['CONN_HEALTH_CHECKS'] = project_database['CONN_HEALTH_CHECKS']
+        return default.__class__(settings_dict, 'default'), True
+
+    def test_pool_opens_with_project_options(self):
+        pooled, created = self.pooled_connection()
+        if created:
+            self.addCleanup(pooled.close_pool)
+            self.addCleanup(pooled.close)
+        with pooled.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+        self.assertEqual(pooled.pool.max_size, project_settings.DB_POOL_MAX_SIZE)
+        # Проверку соединений при выдаче включает CONN_HEALTH_CHECKS
+        self.assertEqual(pooled.pool._check, pooled.pool.check_connection)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(Course), 'replica')
+        self.assertEqual(self.router.db_for_write(Course), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Course), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'fefu_lab'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Course), 'default')
+        response = ReplicaRoutingMiddleware(lambda request: HttpResponse())(self.factory.post('/'))
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_sticky_window_after_write(self):
+        def view(request):
+            return HttpResponse(self.router.db_for_read(Course))
+
+        middleware = ReplicaRoutingMiddleware(view)
+        response = middleware(self.factory.post('/enroll/'))
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+        # Следующий запрос клиента видит свою запись
+        request = self.factory.get('/courses/')
+        request.COOKIES[PRIMARY_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'default')
+
+        self.assertEqual(middleware(self.factory.get('/courses/')).content, b'replica')
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_cache_fill_reads_primary(self):
+        # Кэшированная страница и статистика не должны сохранить отставание реплики
+        cache.clear()
+
+        @cache_anonymous_page(tags=['courses'])
+        def view(request):
+            return HttpResponse(self.router.db_for_read(Course))
+
+        request = self.factory.get('/courses/')
+        request.user = AnonymousUser()
+        self.assertEqual(view(request).content, b'default')
+
+        with mock.patch('fefu_lab.stats.compute_site_stats', lambda: self.router.db_for_read(Course)):
+            self.assertEqual(get_site_stats(), 'default')
+
+    @override_settings(CACHES=TEST_CACHES)
+    async def test_async_cache_fill_reads_primary(self):
+        await cache.aclear()
+
+        @cache_anonymous_page(tags=['courses'])
+        async def view(request):
+            return HttpResponse(self.router.db_for_read(Course))
+
+        request = self.factory.get('/courses/')
+
+        async def auser():
+            return AnonymousUser()
+        request.auser = auser
+        self.assertEqual((await view(request)).content, b'default')
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@fefu.ru', 'password123')
+        Course.objects.bulk_create([
+            Course(title=f'Курс {i}', slug=f'course-{i}', description='...', duration=10,
+                   max_students=30, enrolled_students_count=i * 10)
+            for i in range(3)
+        ])
+        course = Course.objects.get(slug='course-0')
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for student in create_students(5)])
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_sort_by_available_slots(self):
+        # Столбец «Свободных мест» (8-й) сортируется выражением в БД
+        response = self.client.get(reverse('admin:fefu_lab_course_changelist'), {'o': '8'})
+        titles = [course.title for course in response.context['cl'].result_list]
+        self.assertEqual(titles, ['Курс 2', 'Курс 1', 'Курс 0'])
+
+    def test_enrollments_without_full_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:fefu_lab_enrollment_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 5)
+        counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(*)' in q['sql']]
+        self.assertEqual(len(counts), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Оценка числа строк есть только в PostgreSQL')
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE enrollments')
+
+        paginator = EstimatedCountPaginator(Enrollment.objects.all(), 100)
+        paginator.exact_count_limit = 0
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 5)
+
+        # С фильтром оценки нет — точный COUNT
+        filtered = EstimatedCountPaginator(Enrollment.objects.filter(status='CANCELLED'), 100)
+        filtered.exact_count_limit = 0
+        self.assertEqual(filtered.count, 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CourseSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@fefu.ru', 'password123')
+        Course.objects.create(
+            title='Программирование на Python', slug='python', description='Основы языка', duration=36
+        )
+        Course.objects.create(
+            title='Базы данных', slug='databases', description='SQL и программирование запросов', duration=36
+        )
+        Course.objects.create(
+            title='Программирование микроконтроллеров', slug='hidden', description='...', duration=36, is_active=False
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get(reverse('course_search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [course.title for course in response.context['courses']]
+
+    def test_ranked_results(self):
+        # Совпадение в названии важнее совпадения в описании, неактивные не показываются
+        self.assertEqual(self.search('программирование'), ['Программирование на Python', 'Базы данных'])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('астрономия'), [])
+
+    def test_admin_search(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('admin:fefu_lab_course_changelist'), {'q': 'SQL'})
+        self.assertEqual([course.title for course in response.context['cl'].result_list], ['Базы данных'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Морфология есть только в полнотекстовом поиске PostgreSQL')
+    def test_russian_stemming_and_update_on_save(self):
+        self.assertEqual(self.search('программированию python'), ['Программирование на Python'])
+
+        course = Course.objects.get(slug='databases')
+        course.title = 'Реляционные базы данных'
+        course.save()
+        self.assertEqual(self.search('реляционная'), ['Реляционные базы данных'])
+
+    @skipUnless(connection.vendor != 'postgresql', 'Запасной поиск используется без PostgreSQL')
+    def test_trigram_fallback_tolerates_typos(self):
+        results = search_courses('програмирование питон', Course.objects.filter(is_active=True))
+        self.assertEqual([course.title for course in results], ['Программирование на Python', 'Базы данных'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PeopleSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@fefu.ru', 'password123')
+        cls.student_user = User.objects.create_user(
+            'elkin', 'a.elkin@fefu.ru', 'password123', first_name='Артём', last_name='Ёлкин'
+        )
+        cls.student = Profile.objects.create(user=cls.student_user, role='STUDENT', student_id='S-777')
+        teacher = User.objects.create_user('petrova', 'petrova@fefu.ru', 'password123', first_name='Анна', last_name='Петрова')
+        Instructor.objects.create(profile=Profile.objects.create(user=teacher, role='TEACHER'))
+        hidden = User.objects.create_user('hidden', 'hidden@fefu.ru', 'password123', first_name='Анна', last_name='Ёлкина')
+        Profile.objects.create(user=hidden, role='STUDENT', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def autocomplete(self, query):
+        response = self.client.get(reverse('people_autocomplete'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_search_name_follows_user(self):
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.search_name, 'елкин артем a.elkin@fefu.ru s-777')
+
+        self.student_user.last_name = 'Ельцин'
+        self.student_user.save()
+        self.student.refresh_from_db()
+        self.assertTrue(self.student.search_name.startswith('ельцин артем'))
+
+        # Вход обновляет только last_login — профиль не трогаем
+        with self.assertNumQueries(1):
+            self.student_user.save(update_fields=['last_login'])
+
+    def test_autocomplete(self):
+        results = self.autocomplete('ЕЛКИН')
+        self.assertEqual(results, [{
+            'id': self.student.pk, 'name': 'Артём Ёлкин', 'role': 'STUDENT', 'role_display': 'Студент',
+            'url': reverse('student_detail', kwargs={'pk': self.student.pk}),
+        }])
+        # Поиск по email и номеру студенческого, но в ответе их нет
+        self.assertEqual([r['id'] for r in self.autocomplete('s-777')], [self.student.pk])
+        self.assertNotIn('fefu.ru', str(self.autocomplete('a.elkin')))
+        self.assertEqual([r['name'] for r in self.autocomplete('анна')], ['Анна Петрова'])
+        self.assertEqual(self.autocomplete('е'), [])
+
+    def test_admin_search(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('admin:fefu_lab_profile_changelist'), {'q': 'петрова'})
+        self.assertEqual([p.user.username for p in response.context['cl'].result_list], ['petrova'])
+        response = self.client.get(reverse('admin:fefu_lab_instructor_changelist'), {'q': 'petrova@'})
+        self.assertEqual([i.profile.user.username for i in response.context['cl'].result_list], ['petrova'])
+
+    def test_typo_tolerance(self):
+        if not has_trigram_extension(connection.alias):
+            self.skipTest('Нужно расширение pg_trgm')
+        results = search_people('елкен артем', Profile.objects.filter(is_active=True))
+        self.assertEqual(list(results)[:1], [self.student])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EnrollmentFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123')
+        cls.student = Profile.objects.create(user=cls.user, role='STUDENT')
+        cls.course = Course.objects.create(
+            title='Программирование на Python', slug='python', description='Основы языка', duration=36, max_students=10
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_page_does_not_grow_with_catalog(self):
+        response = self.client.get(reverse('enrollment'))
+        self.assertNotContains(response, '<option value="%s"' % self.course.pk)
+        self.assertNotContains(response, 'name="student"')
+        size = len(response.content)
+
+        Course.objects.bulk_create([
+            Course(title=f'Курс {i}', slug=f'course-{i}', description='...', duration=10) for i in range(50)
+        ])
+        self.assertEqual(len(self.client.get(reverse('enrollment')).content), size)
+
+    def test_preselected_course(self):
+        response = self.client.get(reverse('enrollment'), {'course': self.course.pk})
+        self.assertContains(response, 'value="Программирование на Python"')
+        self.assertEqual(self.client.get(reverse('enrollment'), {'course': 'abc'}).status_code, 200)
+
+    def test_enroll(self):
+        response = self.client.post(reverse('enrollment'), {'course': self.course.pk, 'status': 'ACTIVE'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=self.course).exists())
+
+    def test_course_autocomplete(self):
+        response = self.client.get(reverse('course_autocomplete'), {'q': 'прог'})
+        self.assertEqual(response.json()['results'], [{
+            'id': self.course.pk, 'title': 'Программирование на Python', 'available_slots': 10,
+            'label': 'Программирование на Python (свободных мест: 10)',
+        }])
+        self.assertEqual(self.client.get(reverse('course_autocomplete'), {'q': 'п'}).json()['results'], [])
+
+
+def api_json(response):
+    return json.loads(b''.join(response.streaming_content) if response.streaming else response.content)
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create_user('petrov', 'petrov@fefu.ru', 'password123', first_name='Иван', last_name='Петров')
+        cls.instructor = Instructor.objects.create(profile=Profile.objects.create(user=teacher, role='TEACHER'))
+        cls.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36,
+            instructor=cls.instructor, max_students=10,
+        )
+        cls.students = create_students(5)
+        for student in cls.students:
+            Enrollment.objects.create(student=student, course=cls.course, grade='5')
+        for i in range(4):
+            Course.objects.create(title=f'Курс {i}', slug=f'course-{i}', description='...', duration=10, instructor=cls.instructor)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sparse_fields_and_query_plan(self):
+        with self.assertNumQueries(1) as context:
+            response = self.client.get(reverse('api_course_list'), {'fields': 'title,instructor'})
+            data = api_json(response)
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('description', sql)
+        self.assertIn('auth_user', sql)
+        self.assertEqual(data['results'][0], {'title': 'Основы Python', 'instructor': {'id': self.instructor.pk, 'name': 'Иван Петров'}})
+
+        with self.assertNumQueries(1) as context:
+            api_json(self.client.get(reverse('api_course_list'), {'fields': 'slug'}))
+        self.assertNotIn('auth_user', context.captured_queries[0]['sql'])
+
+        response = self.client.get(reverse('api_course_list'), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_prefetch_only_when_requested(self):
+        with self.assertNumQueries(2):
+            data = api_json(self.client.get(reverse('api_instructor_list'), {'fields': 'name,courses'}))
+        self.assertEqual(len(data['results'][0]['courses']), 5)
+        with self.assertNumQueries(1):
+            api_json(self.client.get(reverse('api_instructor_list'), {'fields': 'name'}))
+
+    def test_cursor_pagination(self):
+        url = reverse('api_student_list')
+        first = api_json(self.client.get(url, {'limit': 2, 'fields': 'id'}))
+        self.assertEqual([item['id'] for item in first['results']], [s.pk for s in self.students[:2]])
+        self.assertIsNone(first['previous'])
+
+        second = api_json(self.client.get(first['next']))
+        self.assertEqual([item['id'] for item in second['results']], [s.pk for s in self.students[2:4]])
+        back = api_json(self.client.get(second['previous']))
+        self.assertEqual(back['results'], first['results'])
+
+        last = api_json(self.client.get(second['next']))
+        self.assertEqual([item['id'] for item in last['results']], [self.students[4].pk])
+        self.assertIsNone(last['next'])
+        self.assertEqual(self.client.get(url, {'after': 'broken'}).status_code, 404)
+
+    def test_private_fields_hidden(self):
+        data = api_json(self.client.get(reverse('api_student_detail', kwargs={'pk': self.students[0].pk})))
+        self.assertNotIn('email', data)
+        self.assertNotIn('student_id', data)
+        self.assertEqual(self.client.get(reverse('api_enrollment_list'), {'fields': 'grade'}).status_code, 400)
+
+        staff = User.objects.create_user('admin', 'admin@fefu.ru', 'password123', is_staff=True)
+        self.client.force_login(staff)
+        data = api_json(self.client.get(reverse('api_enrollment_list'), {'fields': 'grade', 'course': self.course.slug}))
+        self.assertEqual([item['grade'] for item in data['results']], ['5'] * 5)
+
+    def test_strong_etag(self):
+        url = reverse('api_course_detail', kwargs={'slug': self.course.slug})
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.filter(student=self.students[0]).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['enrolled_students_count'], 4)
+
+    async def test_async_stream_under_asgi(self):
+        # Синхронный итератор под ASGI Django прочитал бы в память целиком
+        client = AsyncClient()
+        response = await client.get(reverse('api_student_list'), {'limit': 2, 'fields': 'id'})
+        self.assertTrue(response.is_async)
+        first = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([item['id'] for item in first['results']], [s.pk for s in self.students[:2]])
+
+        response = await client.get(first['next'])
+        second = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        response = await client.get(second['previous'])
+        self.assertTrue(response.is_async)
+        back = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual(back['results'], first['results'])
+
+    def test_instructor_rename_changes_course_etag(self):
+        url = reverse('api_course_list')
+        etag = self.client.get(url)['ETag']
+        user = self.instructor.profile.user
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_name = 'Сидоров'
+            user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(api_json(response)['results'][0]['instructor']['name'], 'Иван Сидоров')
+
+
+class EnrollmentExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('petrov', 'petrov@fefu.ru', 'password123')
+        instructor = Instructor.objects.create(profile=Profile.objects.create(user=cls.teacher, role='TEACHER'))
+        cls.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36, instructor=instructor
+        )
+        other = Course.objects.create(title='Чужой курс', slug='other', description='...', duration=10)
+        cls.students = create_students(30)
+        Enrollment.objects.bulk_create(
+            [Enrollment(student=student, course=cls.course, grade='5') for student in cls.students]
+            + [Enrollment(student=cls.students[0], course=other)]
+        )
+        cls.students[1].user.last_name = '=HYPERLINK("http://evil")'
+        cls.students[1].user.save()
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def test_teacher_csv(self):
+        # Пользователь с профилем и все строки выгрузки одним запросом
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('enrollment_export'), {'format': 'csv'})
+            content = b''.join(response.streaming_content).decode()
+        self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+        lines = content.lstrip('\ufeff').splitlines()
+        self.assertEqual(len(lines), 31)
+        self.assertTrue(lines[0].startswith('ID записи,Фамилия'))
+        self.assertNotIn('Чужой курс', content)
+        self.assertIn(',"\'=HYPERLINK(""http://evil"")",', content)
+
+    def test_csv_formula_prefixes(self):
+        for value in ['=1+1', '+1', '-1', '@SUM(A1)', '\t=1+1', '\r=1+1']:
+            with self.subTest(value=value):
+                self.assertEqual(csv_cell(value), "'" + value)
+        self.assertEqual(csv_cell('Иванова'), 'Иванова')
+        self.assertEqual(csv_cell(5), 5)
+
+    def test_teacher_xlsx(self):
+        response = self.client.get(reverse('enrollment_export'), {'format': 'xlsx', 'course': self.course.pk})
+        workbook = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 31)
+        self.assertIn('Основы Python', sheet)
+        self.assertIn('<c s="1">', sheet)
+
+    async def test_async_stream_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.teacher)
+        response = await client.get(reverse('enrollment_export'), {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(content.splitlines()), 31)
+
+        response = await client.get(reverse('enrollment_export'), {'format': 'xlsx'})
+        self.assertTrue(response.is_async)
+        workbook = zipfile.ZipFile(BytesIO(b''.join([chunk async for chunk in response.streaming_content])))
+        self.assertEqual(workbook.read('xl/worksheets/sheet1.xml').decode().count('<row>'), 31)
+
+    def test_students_cannot_export(self):
+        self.client.force_login(self.students[0].user)
+        self.assertEqual(self.client.get(reverse('enrollment_export')).status_code, 403)
+
+    def test_admin_action(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@fefu.ru', 'password123')
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:fefu_lab_enrollment_changelist'), {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': [Enrollment.objects.first().pk],
+        })
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 32)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CardFragmentCacheTests(TestCase):
+    """Ключи кэша карточек меняются вместе с версией тега при изменении связанных User"""
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create_user('petrov', 'petrov@fefu.ru', 'password123', first_name='Иван', last_name='Петров')
+        cls.instructor = Instructor.objects.create(profile=Profile.objects.create(user=teacher, role='TEACHER'))
+        cls.course = Course.objects.create(
+            title='Основы Python', slug='python-basics', description='...', duration=36, instructor=cls.instructor
+        )
+        cls.student_user = User.objects.create_user('anna', 'anna@fefu.ru', 'password123', first_name='Анна', last_name='Иванова')
+        cls.student = Profile.objects.create(user=cls.student_user, role='STUDENT')
+        Enrollment.objects.create(student=cls.student, course=cls.course)
+
+    def setUp(self):
+        cache.clear()
+        caches['templates'].clear()
+
+    def rename(self, user, last_name):
+        with self.captureOnCommitCallbacks(execute=True):
+            user.last_name = last_name
+            user.email = f'{user.username}@new.fefu.ru'
+            user.save()
+
+    def test_student_card(self):
+        self.assertContains(self.client.get(reverse('student_list')), 'anna@fefu.ru')
+        self.rename(self.student_user, 'Смирнова')
+        response = self.client.get(reverse('student_list'))
+        self.assertContains(response, 'Анна Смирнова')
+        self.assertContains(response, 'anna@new.fefu.ru')
+
+    def test_instructor_name_in_course_cards(self):
+        self.assertContains(self.client.get(reverse('course_list')), 'Иван Петров')
+        self.client.force_login(self.student_user)
+        self.assertContains(self.client.get(reverse('profile')), 'Иван Петров')
+
+        self.rename(self.instructor.profile.user, 'Сидоров')
+        self.assertContains(self.client.get(reverse('profile')), 'Иван Сидоров')
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('course_list')), 'Иван Сидоров')
@@ -1,7 +1,7 @@
 from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Основные страницы
@@ -14,8 +14,22 @@ urlpatterns = [
     
     # Курсы
     path('courses/', views.course_list, name='course_list'),
+    path('courses/search/', views.course_search, name='course_search'),
     path('course/<slug:slug>/', views.course_detail, name='course_detail'),
     
+    # Подсказки для полей поиска (JSON)
+    path('autocomplete/people/', views.people_autocomplete, name='people_autocomplete'),
+    path('autocomplete/courses/', views.course_autocomplete, name='course_autocomplete'),
+    
+    # JSON API только для чтения
+    path('api/courses/', api.course_list, name='api_course_list'),
+    path('api/courses/<slug:slug>/', api.course_detail, name='api_course_detail'),
+    path('api/instructors/', api.instructor_list, name='api_instructor_list'),
+    path('api/instructors/<int:pk>/', api.instructor_detail, name='api_instructor_detail'),
+    path('api/students/', api.student_list, name='api_student_list'),
+    path('api/students/<int:pk>/', api.student_detail, name='api_student_detail'),
+    path('api/enrollments/', api.enrollment_list, name='api_enrollment_list'),
+    
     # Формы
     path('feedback/', views.feedback_view, name='feedback'),
     path('enrollment/', views.enrollment_view, name='enrollment'),
@@ -28,6 +42,7 @@ urlpatterns = [
     # Профиль
     path('profile/', views.profile_view, name='profile'),
     path('profile/edit/', views.profile_edit_view, name='profile_edit'),
+    path('profile/export/', views.enrollment_export, name='enrollment_export'),
 ]
 
 # Добавляем обработку медиафайлов в режиме разработки
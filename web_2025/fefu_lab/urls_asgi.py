@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import urls, views
+
+
+# Под ASGI страницы для чтения обслуживают async-варианты представлений;
+# остальные маршруты и имена те же, что в urls.py, поэтому reverse() не меняется
+ASYNC_VIEWS = {
+    'home': views.ahome_page,
+    'student_list': views.astudent_list,
+    'course_list': views.acourse_list,
+    'course_detail': views.acourse_detail,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in urls.urlpatterns
+]
@@ -1,25 +1,47 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth import login, logout, authenticate
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.db import IntegrityError
+from django.db.models import Prefetch
 from .models import Course, Instructor, Enrollment, Profile
+from .decorators import teacher_required
+from .exports import export_enrollments
+from .middleware import get_profile, set_profile
+from .page_cache import cache_anonymous_page, conditional_page
+from .pagination import akeyset_paginate, keyset_paginate
+from .search import autocomplete_courses, search_courses, search_people
+from .stats import aget_site_stats, get_site_stats
+from .services import enroll_student, ENROLL_OK, ENROLL_ALREADY, ENROLL_FULL
 from .forms import FeedbackForm, EnrollmentForm, CustomAuthenticationForm, StudentRegistrationForm, TeacherRegistrationForm, ProfileForm
 
 
-def home_page(request):
-    """Главная страница с статистикой"""
-    total_students = Profile.objects.filter(role='STUDENT', is_active=True).count()
-    total_courses = Course.objects.filter(is_active=True).count()
-    recent_courses = Course.objects.filter(is_active=True).order_by('-created_at')[:3]
-    
+def render_home(request, stats):
     return render(request, 'fefu_lab/home.html', {
-        'total_students': total_students,
-        'total_courses': total_courses,
-        'recent_courses': recent_courses
+        'total_students': stats['active_students'],
+        'total_courses': stats['active_courses'],
+        'recent_courses': stats['recent_courses']
     })
 
 
+@conditional_page(tags=['courses', 'students'])
+@cache_anonymous_page(tags=['courses', 'students'])
+def home_page(request):
+    """Главная страница с статистикой"""
+    return render_home(request, get_site_stats())
+
+
+@conditional_page(tags=['courses', 'students'])
+@cache_anonymous_page(tags=['courses', 'students'])
+async def ahome_page(request):
+    """home_page для ASGI"""
+    return render_home(request, await aget_site_stats())
+
+
+@conditional_page()
+@cache_anonymous_page()
 def about_page(request):
     """Страница 'О нас'"""
     return render(request, 'fefu_lab/about.html')
@@ -33,21 +55,14 @@ def login_view(request):
     
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
+        # Форма уже вызвала authenticate() — повторная проверка стоила бы еще одного хэширования
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(request, username=username, password=password)
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f'Добро пожаловать, {user.first_name}!')
             
-            if user is not None:
-                # Устанавливаем бэкенд вручную
-                user.backend = 'django.contrib.auth.backends.ModelBackend'
-                login(request, user)
-                messages.success(request, f'Добро пожаловать, {user.first_name}!')
-                
-                next_page = request.GET.get('next', 'profile')
-                return redirect(next_page)
-            else:
-                messages.error(request, 'Неверные имя пользователя или пароль.')
+            next_page = request.GET.get('next', 'profile')
+            return redirect(next_page)
     else:
         form = CustomAuthenticationForm()
     
@@ -76,8 +91,6 @@ def register_view(request):
                 user = form.save()
                 
                 # Устанавливаем бэкенд для пользователя
-                user.backend = 'django.contrib.auth.backends.ModelBackend'
-                # ИЛИ используйте ваш кастомный бэкенд:
                 user.backend = 'fefu_lab.backends.EmailBackend'
                 
                 # Автоматический вход после регистрации
@@ -102,14 +115,16 @@ def register_view(request):
 @login_required
 def profile_view(request):
     """Личный кабинет пользователя"""
-    try:
-        profile = request.user.profile
-    except Profile.DoesNotExist:
+    profile = get_profile(request)
+    if profile is None:
         # Создаем профиль, если его нет
         profile = Profile.objects.create(user=request.user, role='STUDENT')
+        set_profile(request, profile)
     
     if profile.role == 'STUDENT':
-        enrollments = Enrollment.objects.filter(student=profile, status='ACTIVE')
+        enrollments = Enrollment.objects.filter(student=profile, status='ACTIVE').select_related(
+            'course__instructor__profile__user'
+        )
         return render(request, 'fefu_lab/dashboard/student_dashboard.html', {
             'profile': profile,
             'enrollments': enrollments
@@ -117,8 +132,15 @@ def profile_view(request):
     
     elif profile.role == 'TEACHER':
         try:
-            instructor = Instructor.objects.get(profile=profile)
-            courses = Course.objects.filter(instructor=instructor, is_active=True)
+            instructor = profile.instructor_info
+            # Один запрос на курсы и один на все активные записи с пользователями
+            courses = Course.objects.filter(instructor=instructor, is_active=True).prefetch_related(
+                Prefetch(
+                    'enrollments',
+                    queryset=Enrollment.objects.filter(status='ACTIVE').select_related('student__user'),
+                    to_attr='active_enrollments'
+                )
+            )
         except Instructor.DoesNotExist:
             courses = Course.objects.none()
             instructor = None
@@ -126,11 +148,10 @@ def profile_view(request):
         # Формируем список курсов с информацией о записях
         courses_with_enrollments = []
         for course in courses:
-            enrollments = Enrollment.objects.filter(course=course, status='ACTIVE')
             courses_with_enrollments.append({
                 'course': course,
-                'enrollments': enrollments,
-                'enrollment_count': enrollments.count()
+                'enrollments': course.active_enrollments,
+                'enrollment_count': len(course.active_enrollments)
             })
         
         return render(request, 'fefu_lab/dashboard/teacher_dashboard.html', {
@@ -140,17 +161,14 @@ def profile_view(request):
         })
     
     elif profile.role == 'ADMIN':
-        total_students = Profile.objects.filter(role='STUDENT').count()
-        total_teachers = Profile.objects.filter(role='TEACHER').count()
-        total_courses = Course.objects.count()
-        total_enrollments = Enrollment.objects.count()
+        stats = get_site_stats()
         
         return render(request, 'fefu_lab/dashboard/admin_dashboard.html', {
             'profile': profile,
-            'total_students': total_students,
-            'total_teachers': total_teachers,
-            'total_courses': total_courses,
-            'total_enrollments': total_enrollments
+            'total_students': stats['total_students'],
+            'total_teachers': stats['total_teachers'],
+            'total_courses': stats['total_courses'],
+            'total_enrollments': stats['total_enrollments']
         })
     
     return redirect('home')
@@ -158,13 +176,23 @@ def profile_view(request):
 
 
 
+@teacher_required
+def enrollment_export(request):
+    """Выгрузка записей на курсы преподавателя с оценками: ?format=csv|xlsx, ?course=<id>"""
+    enrollments = Enrollment.objects.filter(course__instructor__profile=get_profile(request))
+    course = request.GET.get('course', '')
+    if course.isdigit():
+        enrollments = enrollments.filter(course_id=course)
+    return export_enrollments(request, enrollments, request.GET.get('format'))
+
+
 @login_required
 def profile_edit_view(request):
     """Редактирование профиля"""
-    try:
-        profile = request.user.profile
-    except Profile.DoesNotExist:
+    profile = get_profile(request)
+    if profile is None:
         profile = Profile.objects.create(user=request.user, role='STUDENT')
+        set_profile(request, profile)
     
     if request.method == 'POST':
         form = ProfileForm(request.POST, request.FILES, instance=profile)
@@ -179,33 +207,170 @@ def profile_edit_view(request):
 
 
 # ========== ОСТАЛЬНЫЕ ПРЕДСТАВЛЕНИЯ ==========
+# У страниц для чтения есть async-варианты (префикс a), их подключает
+# fefu_lab/urls_asgi.py: под ASGI ожидание БД не занимает поток воркера,
+# а под WSGI async-представление шло бы через async_to_sync
+
+STUDENT_LIST_KEYS = ['user__last_name', 'user__first_name', 'pk']
 
+
+def student_cards():
+    """Активные студенты с полями для карточки student_card.html"""
+    return (
+        Profile.objects.filter(role='STUDENT', is_active=True)
+        .select_related('user')
+        .only('faculty', 'is_active', 'updated_at', 'user__first_name', 'user__last_name', 'user__email')
+    )
+
+
+@conditional_page(tags=['students'])
+@cache_anonymous_page(tags=['students'])
 def student_list(request):
     """Список всех студентов"""
-    students = Profile.objects.filter(role='STUDENT', is_active=True).order_by('user__last_name')
-    return render(request, 'fefu_lab/student_list.html', {'students': students})
+    page = keyset_paginate(request, student_cards(), STUDENT_LIST_KEYS)
+    return render(request, 'fefu_lab/student_list.html', {'students': page, 'page': page})
+
+
+@conditional_page(tags=['students'])
+@cache_anonymous_page(tags=['students'])
+async def astudent_list(request):
+    """student_list для ASGI"""
+    page = await akeyset_paginate(request, student_cards(), STUDENT_LIST_KEYS)
+    return render(request, 'fefu_lab/student_list.html', {'students': page, 'page': page})
 
 
 def student_detail(request, pk):
     """Детальная информация о студенте"""
-    student = get_object_or_404(Profile, pk=pk, role='STUDENT')
-    enrollments = student.enrollments.filter(status='ACTIVE')
+    student = get_object_or_404(Profile.objects.select_related('user'), pk=pk, role='STUDENT')
+    enrollments = student.enrollments.filter(status='ACTIVE').select_related('course__instructor__profile__user')
     return render(request, 'fefu_lab/student_detail.html', {
         'student': student,
         'enrollments': enrollments
     })
 
 
+def course_cards():
+    """Активные курсы с полями для карточки course_card.html"""
+    return (
+        Course.objects.filter(is_active=True)
+        .select_related('instructor__profile__user')
+        .only(
+            'title', 'slug', 'duration', 'level', 'price', 'max_students', 'enrolled_students_count', 'updated_at',
+            'instructor__profile__user__first_name', 'instructor__profile__user__last_name'
+        )
+    )
+
+
+@conditional_page(tags=['courses', 'instructors'])
+@cache_anonymous_page(tags=['courses', 'instructors'])
 def course_list(request):
     """Список всех курсов"""
-    courses = Course.objects.filter(is_active=True)
-    return render(request, 'fefu_lab/course_list.html', {'courses': courses})
+    page = keyset_paginate(request, course_cards(), ['title', 'pk'])
+    return render(request, 'fefu_lab/course_list.html', {'courses': page, 'page': page})
+
+
+@conditional_page(tags=['courses', 'instructors'])
+@cache_anonymous_page(tags=['courses', 'instructors'])
+async def acourse_list(request):
+    """course_list для ASGI"""
+    page = await akeyset_paginate(request, course_cards(), ['title', 'pk'])
+    return render(request, 'fefu_lab/course_list.html', {'courses': page, 'page': page})
+
+
+@conditional_page(tags=['courses', 'instructors'])
+@cache_anonymous_page(tags=['courses', 'instructors'])
+def course_search(request):
+    """Поиск курсов по названию и описанию, от наиболее подходящих"""
+    query = request.GET.get('q', '').strip()[:200]
+    results = search_courses(query, course_cards()) if query else []
+    page = Paginator(results, 20).get_page(request.GET.get('page'))
+    return render(request, 'fefu_lab/course_search.html', {
+        'title': 'Поиск курсов',
+        'query': query,
+        'courses': page,
+        'page': page,
+    })
 
 
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_LIMIT = 10
+
+
+@conditional_page(tags=['students', 'instructors'])
+@cache_anonymous_page(tags=['students', 'instructors'])
+def people_autocomplete(request):
+    """Подсказки для поиска студентов и преподавателей: ?q=иванов"""
+    query = request.GET.get('q', '').strip()[:100]
+    results = []
+    if len(query) >= AUTOCOMPLETE_MIN_LENGTH:
+        profiles = search_people(
+            query,
+            Profile.objects.filter(is_active=True, role__in=['STUDENT', 'TEACHER'])
+            .select_related('user')
+            .only('role', 'user__first_name', 'user__last_name', 'user__username'),
+        )[:AUTOCOMPLETE_LIMIT]
+        # Email и номер студенческого участвуют в поиске, но не показываются
+        results = [
+            {
+                'id': profile.pk,
+                'name': profile.user.get_full_name() or profile.user.username,
+                'role': profile.role,
+                'role_display': profile.get_role_display(),
+                'url': profile.get_absolute_url() if profile.role == 'STUDENT' else None,
+            }
+            for profile in profiles
+        ]
+    return JsonResponse({'results': results})
+
+
+@conditional_page(tags=['courses'])
+@cache_anonymous_page(tags=['courses'])
+def course_autocomplete(request):
+    """Подсказки для выбора курса в форме записи: ?q=python"""
+    query = request.GET.get('q', '').strip()[:100]
+    results = []
+    if len(query) >= AUTOCOMPLETE_MIN_LENGTH:
+        courses = autocomplete_courses(
+            query,
+            Course.objects.filter(is_active=True).only('title', 'max_students', 'enrolled_students_count'),
+        )[:AUTOCOMPLETE_LIMIT]
+        results = [
+            {
+                'id': course.pk,
+                'title': course.title,
+                'available_slots': course.available_slots,
+                'label': f'{course.title} (свободных мест: {course.available_slots})',
+            }
+            for course in courses
+        ]
+    return JsonResponse({'results': results})
+
+
+def course_with_instructor():
+    return Course.objects.select_related('instructor__profile__user')
+
+
+def active_enrollments(course):
+    return course.enrollments.filter(status='ACTIVE').select_related('student__user')
+
+
+@conditional_page(tags=lambda slug: [f'course:{slug}', 'instructors'])
+@cache_anonymous_page(tags=lambda slug: [f'course:{slug}', 'instructors'])
 def course_detail(request, slug):
     """Детальная информация о курсе"""
-    course = get_object_or_404(Course, slug=slug)
-    enrollments = course.enrollments.filter(status='ACTIVE')
+    course = get_object_or_404(course_with_instructor(), slug=slug)
+    return render(request, 'fefu_lab/course_detail.html', {
+        'course': course,
+        'enrollments': active_enrollments(course)
+    })
+
+
+@conditional_page(tags=lambda slug: [f'course:{slug}', 'instructors'])
+@cache_anonymous_page(tags=lambda slug: [f'course:{slug}', 'instructors'])
+async def acourse_detail(request, slug):
+    """course_detail для ASGI"""
+    course = await aget_object_or_404(course_with_instructor(), slug=slug)
+    enrollments = [enrollment async for enrollment in active_enrollments(course).aiterator()]
     return render(request, 'fefu_lab/course_detail.html', {
         'course': course,
         'enrollments': enrollments
@@ -228,9 +393,8 @@ def feedback_view(request):
 @login_required
 def enrollment_view(request):
     """Запись на курс"""
-    try:
-        profile = request.user.profile
-    except Profile.DoesNotExist:
+    profile = get_profile(request)
+    if profile is None:
         messages.error(request, 'Профиль не найден.')
         return redirect('profile')
     
@@ -241,23 +405,21 @@ def enrollment_view(request):
     if request.method == 'POST':
         form = EnrollmentForm(request.POST)
         if form.is_valid():
-            enrollment = form.save(commit=False)
-            enrollment.student = profile
-            enrollment.status = 'ACTIVE'
+            course = form.cleaned_data['course']
+            result, enrollment = enroll_student(profile, course)
             
-            # Проверяем, не записан ли уже на курс
-            if Enrollment.objects.filter(student=profile, course=enrollment.course, status='ACTIVE').exists():
+            if result == ENROLL_OK:
+                messages.success(request, f'Вы успешно записались на курс "{course.title}"!')
+                return redirect('profile')
+            elif result == ENROLL_ALREADY:
                 messages.error(request, 'Вы уже записаны на этот курс!')
+            elif result == ENROLL_FULL:
+                messages.error(request, f'На курсе "{course.title}" не осталось свободных мест.')
             else:
-                enrollment.save()
-                messages.success(request, f'Вы успешно записались на курс "{enrollment.course.title}"!')
-                return redirect('profile')
+                messages.error(request, f'Запись на курс "{course.title}" закрыта.')
     else:
-        form = EnrollmentForm()
+        # Ссылка «Записаться на этот курс» передает ?course=<pk>
+        form = EnrollmentForm(initial={'course': request.GET.get('course')})
     
-    # Получаем доступные курсы
-    available_courses = Course.objects.filter(is_active=True)
-    return render(request, 'fefu_lab/enrollment.html', {
-        'form': form,
-        'available_courses': available_courses
-    })
\ No newline at end of file
+    # Курсы не загружаются заранее: поле выбора получает подсказки из course_autocomplete
+    return render(request, 'fefu_lab/enrollment.html', {'form': form})
\ No newline at end of file
@@ -39,31 +39,49 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Полнотекстовый поиск курсов (в SQLite — запасной поиск в памяти)
+    'django.contrib.postgres',
     'fefu_lab',  # ← ДОБАВЛЯЕМ ЭТУ СТРОЧКУ
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Сжимает ответы длиннее 200 байт для клиентов с Accept-Encoding: gzip
+    # (с защитой от BREACH); ETag и 304 для страниц — conditional_page
+    'django.middleware.gzip.GZipMiddleware',
+    'fefu_lab.middleware.AsgiUrlconfMiddleware',
+    'fefu_lab.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'fefu_lab.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'web_2025.urls'
+# Под ASGI (deploy/gunicorn/asgi.py) страницы для чтения — async-представления
+ASGI_URLCONF = 'web_2025.urls_asgi'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # Версии тегов для ключей кэша карточек (partials/*_card.html)
+                'fefu_lab.context_processors.card_versions',
+            ],
+            # Скомпилированные шаблоны хранятся в памяти процесса
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -91,9 +109,113 @@ DATABASES = {
         'PASSWORD': '1234',
         'HOST': 'localhost',
         'PORT': '5432',
+        'OPTIONS': {},
     }
 }
 
+# Пул соединений psycopg: соединение берется из пула на время запроса и
+# возвращается после него, TCP- и auth-рукопожатие происходит только при
+# открытии соединения пулом. Размер пула задается на один процесс воркера:
+#   sync (gthread) — поток держит не больше одного соединения, поэтому
+#     DB_POOL_MAX_SIZE >= threads из deploy/gunicorn/config.py;
+#   ASGI (uvicorn) — ORM каждого запроса выполняется в своем потоке,
+#     max_size ограничивает число одновременных запросов к БД, остальные
+#     ждут свободное соединение до DB_POOL_TIMEOUT секунд.
+# Всего соединений: workers × DB_POOL_MAX_SIZE плюс manage.py и cron — это
+# должно быть меньше max_connections PostgreSQL (по умолчанию 100).
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 4))
+DB_POOL_TIMEOUT = 10
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:  # без psycopg[pool] — постоянные соединения (только WSGI)
+    ConnectionPool = None
+
+if ConnectionPool is not None:
+    # Пул и CONN_MAX_AGE несовместимы: CONN_MAX_AGE остается 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+        # Простаивающие соединения закрываются, старые пересоздаются
+        'max_idle': 300,
+        'max_lifetime': 1800,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = 60
+
+# Проверка соединения перед использованием (после рестарта PostgreSQL); с
+# пулом Django передает ConnectionPool.check_connection в check= сам
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплики только для чтения: списки, статистика и дашборды читают с них,
+# запись и чтение внутри транзакций идут в default. После запроса с
+# записью клиент REPLICA_STICKY_SECONDS читает с default (cookie), чтобы
+# увидеть свои изменения до того, как их получит реплика.
+# Локально реплику можно изобразить второй БД с теми же данными:
+# DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['fefu_lab.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Файловый кэш общий для всех воркеров gunicorn на одной машине,
+# поэтому сброс статистики в одном воркере виден остальным
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 300,
+    },
+    # Фрагменты шаблонов (карточки) — ключ включает updated_at, поэтому
+    # локального кэша каждого воркера достаточно
+    'templates': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fefu_lab_templates',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Сессии должны быть общими для всех воркеров: локальный кэш каждого
+    # процесса отдавал бы, например, уже завершенную в другом воркере сессию.
+    # FileBasedCache перед каждой записью перебирает все файлы каталога
+    # (проверка MAX_ENTRIES): при 100 000 файлов это ~270 мс на запись сессии,
+    # при 2000 — ~5 мс. Вытесненную сессию cached_db прочитает из БД.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'sessions',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Блокировка пересчета статистики (fefu_lab/stats.py) держится на cache.add(),
+# версии тегов страниц — на cache.incr(). В FileBasedCache это чтение и запись
+# файла без блокировки между процессами: при одновременном промахе статистику
+# могут пересчитать несколько воркеров сразу. В Redis обе операции атомарны
+# (SET NX, INCR), поэтому при нескольких воркерах задайте REDIS_URL в .env.
+# Сессии тогда тоже хранятся в Redis: запись не зависит от числа сессий.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': 300,
+    }
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': None,
+        'KEY_PREFIX': 'sessions',
+    }
+
+# Время жизни страниц, закэшированных для анонимных посетителей (секунды)
+PAGE_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,15 +252,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic добавляет в имена файлов хэш содержимого и создает сжатые
+# копии .gz (и .br при установленном пакете brotli) для nginx
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'fefu_lab.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# fefu_lab/static находит AppDirectoriesFinder; повторное указание здесь
+# заставляло collectstatic обрабатывать style.css дважды
 STATICFILES_DIRS = [
     # BASE_DIR / "static",
-    BASE_DIR / 'fefu_lab' / 'static',
 ]
 
 
@@ -148,23 +283,43 @@ LOGIN_REDIRECT_URL = '/profile/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Настройки сессии
+# cached_db читает сессию из кэша 'sessions' и обращается к БД только при
+# промахе; запись идет в оба места. Другие варианты SESSION_ENGINE:
+# 'django.contrib.sessions.backends.cache' — только кэш (сессии теряются при его очистке),
+# 'django.contrib.sessions.backends.signed_cookies' — без хранилища на сервере
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 1209600  # 2 недели
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+# Истекшие сессии удаляются командой cleanup_sessions (по расписанию)
+
+# Сообщения хранятся в подписанной cookie: всплывающие сообщения
+# анонимных посетителей не создают сессию в БД
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
 # Безопасность (в продакшене должно быть True)
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 
-# Кастомные бэкенды аутентификации
+# Кастомный бэкенд аутентификации. EmailBackend сам принимает и email, и имя
+# пользователя; ModelBackend после него хэшировал бы пароль повторно при каждой ошибке
 AUTHENTICATION_BACKENDS = [
     'fefu_lab.backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Время кэширования пользователя с профилем между запросами, секунды.
+# 0 — загружать из БД на каждый запрос (одним запросом с JOIN)
+USER_CACHE_TIMEOUT = 0
+
 # Настройки для загрузки файлов
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры аватаров создаются в фоновом пуле потоков после сохранения профиля
+AVATAR_THUMBNAIL_ASYNC = True
+AVATAR_THUMBNAIL_WORKERS = 2
+AVATAR_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
 
 TEACHER_INVITATION_CODE = "fefu2024"
 ADMIN_REGISTRATION_KEY = "superadmin2024"
@@ -0,0 +1,18 @@
+"""
+URL проекта для запросов через ASGI (fefu_lab.middleware.AsgiUrlconfMiddleware):
+то же, что urls.py, но приложение подключено с async-страницами fefu_lab/urls_asgi.py.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from django.conf import settings
+from django.conf.urls.static import static
+
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('fefu_lab.urls_asgi')),
+]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)